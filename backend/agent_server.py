@@ -1,12 +1,22 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pathlib import Path
-import yfinance as yf
 import requests
+import json
 import threading
 import time
 import os
 from dotenv import load_dotenv
+from answer_cache import AnswerCache
+from token_budget import (PROMPT_TOKEN_BUDGET, TokenMeter, clip, estimate, estimate_messages,
+                          fit_history, summarize)
+from llm_router import Router
+from llm_transport import Provider
+from market_data import MarketData
+from quote_stream import sse
+from shared_cache import open_cache
 
 # Load from root quantdesk/.env
 load_dotenv(Path(__file__).parent.parent / ".env")
@@ -37,34 +47,71 @@ CLAUDE_MODEL  = "claude-sonnet-4-20250514"
 GROQ_KEY      = os.getenv("GROQ_API_KEY")
 GROQ_MODEL    = "llama-3.3-70b-versatile"
 
+# Persistent pooled connections — a chat turn (or a Groq fallback) reuses a warm socket
+claude = Provider(
+    "claude", "https://api.anthropic.com/v1/messages",
+    pool_size=int(os.getenv("CLAUDE_POOL_SIZE", 8)),
+    connect_timeout=float(os.getenv("CLAUDE_CONNECT_TIMEOUT", 5)),
+    read_timeout=float(os.getenv("CLAUDE_READ_TIMEOUT", 30)),
+)
+groq = Provider(
+    "groq", "https://api.groq.com/openai/v1/chat/completions",
+    pool_size=int(os.getenv("GROQ_POOL_SIZE", 8)),
+    connect_timeout=float(os.getenv("GROQ_CONNECT_TIMEOUT", 5)),
+    read_timeout=float(os.getenv("GROQ_READ_TIMEOUT", 30)),
+)
+for provider, key in ((claude, ANTHROPIC_KEY), (groq, GROQ_KEY)):
+    if key:
+        threading.Thread(target=provider.warm, daemon=True).start()
+
+# Same shared cache as server.py, so fundamentals fetched by either are reused
+market = MarketData(open_cache())
+
+SNAPSHOT_TIMEOUT = float(os.getenv("SNAPSHOT_TIMEOUT", 12))   # max seconds a snapshot waits on upstream
+MAX_COMPARE      = int(os.getenv("MAX_COMPARE", 10))          # tickers per /agent/compare request
+snapshot_pool    = ThreadPoolExecutor(max_workers=24, thread_name_prefix="snapshot")
+
+def gather(calls, timeout=SNAPSHOT_TIMEOUT):
+    """Run {name: (fn, default)} concurrently. Whatever has not finished when
+    the shared deadline passes gets its default; it keeps running and fills
+    the cache for the next request. Returns (results, names that defaulted)."""
+    futures  = {name: snapshot_pool.submit(fn) for name, (fn, _) in calls.items()}
+    deadline = time.time() + timeout
+    out, missed = {}, []
+    for name, future in futures.items():
+        try:
+            out[name] = future.result(timeout=max(0.0, deadline - time.time()))
+            continue
+        except FutureTimeout:
+            print(f"[agent] {name} timed out after {timeout:.0f}s")
+        except Exception as e:
+            print(f"[agent] {name} failed: {e}")
+        out[name] = calls[name][1]
+        missed.append(name)
+    return out, missed
+
 # ── Fetch rich stock data ─────────────────────────────────────────
+def price_fields(quote):
+    if not quote:
+        return {"price": None, "change_pct": 0}
+    return {"price": round(quote["price"], 2), "change_pct": round(quote["pct"], 2)}
+
 def get_full_stock_data(ticker: str) -> dict:
     try:
-        t    = yf.Ticker(ticker)
-        info = t.info
-        hist = t.history(period="5d")
-
-        price      = round(float(hist["Close"].iloc[-1]), 2) if not hist.empty else None
-        prev_close = round(float(hist["Close"].iloc[-2]), 2) if len(hist) >= 2 else price
-        change_pct = round((price - prev_close) / prev_close * 100, 2) if prev_close else 0
-
-        try:
-            recs       = t.recommendations
-            latest_rec = recs.iloc[-1].to_dict() if recs is not None and not recs.empty else {}
-        except Exception:
-            latest_rec = {}
-
-        try:
-            earnings      = t.earnings_dates
-            next_earnings = str(earnings.index[0].date()) if earnings is not None and not earnings.empty else "N/A"
-        except Exception:
-            next_earnings = "N/A"
+        # Fundamentals, the latest price and the earnings date are independent
+        parts, missed = gather({
+            "info":     (lambda: market.fundamentals([ticker])[ticker], {}),
+            "price":    (lambda: market.prices([ticker]).get(ticker),   None),
+            "earnings": (lambda: market.next_earnings(ticker),          "N/A"),
+        })
+        info          = parts["info"]
+        next_earnings = parts["earnings"]
+        partial       = bool(missed) or not info
 
         return {
             "ticker":         ticker,
             "name":           info.get("longName", ticker),
-            "price":          price,
-            "change_pct":     change_pct,
+            **price_fields(parts["price"]),
             "sector":         info.get("sector", "N/A"),
             "industry":       info.get("industry", "N/A"),
             "market_cap":     info.get("marketCap"),
@@ -84,12 +131,65 @@ def get_full_stock_data(ticker: str) -> dict:
             "analyst_target": info.get("targetMeanPrice"),
             "recommendation": info.get("recommendationKey", "N/A"),
             "next_earnings":  next_earnings,
-            "description":    (info.get("longBusinessSummary", ""))[:400],
+            "description":    (info.get("longBusinessSummary") or "")[:400],
+            "partial":        partial,   # some part fell back to its default
         }
     except Exception as e:
         return {"ticker": ticker, "error": str(e)}
 
 
+# ── Snapshot cache ────────────────────────────────────────────────
+SNAPSHOT_PRICE_TTL        = int(os.getenv("SNAPSHOT_PRICE_TTL", 30))           # price / change_pct
+SNAPSHOT_FUNDAMENTALS_TTL = int(os.getenv("SNAPSHOT_FUNDAMENTALS_TTL", 3600))  # everything else
+SNAPSHOT_CACHE_SIZE       = 500
+
+_snapshots      = OrderedDict()   # ticker -> {"data", "price_at", "info_at"}
+_snapshots_lock = threading.Lock()
+snapshot_stats  = {"hits": 0, "price_refreshes": 0, "misses": 0, "partial": 0}
+
+def get_snapshot(ticker: str) -> dict:
+    """get_full_stock_data, cached per ticker with per-field freshness.
+
+    Follow-up questions inside SNAPSHOT_PRICE_TTL reuse the whole snapshot.
+    After that only the price fields are re-read; fundamentals, analyst
+    fields and the earnings date are rebuilt every SNAPSHOT_FUNDAMENTALS_TTL.
+    A partial snapshot (a part timed out or Yahoo returned no fundamentals)
+    is only kept for SNAPSHOT_PRICE_TTL, so the next request retries it.
+    """
+    now = time.time()
+    with _snapshots_lock:
+        entry = _snapshots.get(ticker)
+        if entry:
+            _snapshots.move_to_end(ticker)
+    if entry and now - entry["info_at"] < SNAPSHOT_FUNDAMENTALS_TTL:
+        if now - entry["price_at"] < SNAPSHOT_PRICE_TTL:
+            snapshot_stats["hits"] += 1
+            return entry["data"]
+        quote = gather({"price": (lambda: market.prices([ticker]).get(ticker), None)})[0]["price"]
+        if not quote:
+            return entry["data"]
+        snapshot_stats["price_refreshes"] += 1
+        data = dict(entry["data"], **price_fields(quote))
+        store_snapshot(ticker, data, price_at=now, info_at=entry["info_at"])
+        return data
+    snapshot_stats["misses"] += 1
+    data    = get_full_stock_data(ticker)
+    partial = data.pop("partial", False)
+    if "error" not in data:
+        if partial:
+            snapshot_stats["partial"] += 1
+        info_at = now - SNAPSHOT_FUNDAMENTALS_TTL + SNAPSHOT_PRICE_TTL if partial else now
+        store_snapshot(ticker, data, price_at=now, info_at=info_at)
+    return data
+
+def store_snapshot(ticker, data, price_at, info_at):
+    with _snapshots_lock:
+        _snapshots[ticker] = {"data": data, "price_at": price_at, "info_at": info_at}
+        _snapshots.move_to_end(ticker)
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+
+
 def fmt(n, prefix="$"):
     if n is None: return "N/A"
     try: n = float(n)
@@ -107,12 +207,11 @@ def pct(n):
 
 # ── Claude (primary) ─────────────────────────────────────────────
 def ask_claude(system: str, messages: list, max_tokens: int = 1500):
-    """Returns (text, success)"""
+    """Returns (text, success, usage)"""
     if not ANTHROPIC_KEY:
-        return None, False
+        return None, False, None
     try:
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages",
+        response = claude.post(
             headers={
                 "Content-Type":      "application/json",
                 "x-api-key":         ANTHROPIC_KEY,
@@ -124,28 +223,28 @@ def ask_claude(system: str, messages: list, max_tokens: int = 1500):
                 "system":     system,
                 "messages":   messages,
             },
-            timeout=30
         )
         if response.status_code == 200:
-            text = response.json().get("content", [{}])[0].get("text", "")
-            return text, True
+            body  = response.json()
+            text  = body.get("content", [{}])[0].get("text", "")
+            usage = body.get("usage") or {}
+            return text, True, {"input": usage.get("input_tokens"), "output": usage.get("output_tokens")}
         # Any error (including 400 credit exhausted) → fall back
         print(f"[agent] Claude failed ({response.status_code}) — falling back to Groq")
-        return None, False
+        return None, False, None
     except Exception as e:
         print(f"[agent] Claude exception: {e} — falling back to Groq")
-        return None, False
+        return None, False, None
 
 
 # ── Groq (fallback) ───────────────────────────────────────────────
 def ask_groq(system: str, messages: list, max_tokens: int = 1500):
-    """Returns (text, success)"""
+    """Returns (text, success, usage)"""
     if not GROQ_KEY:
-        return "⚠ No AI available. Add GROQ_API_KEY to .env — free at console.groq.com", False
+        return "⚠ No AI available. Add GROQ_API_KEY to .env — free at console.groq.com", False, None
     try:
         groq_messages = [{"role": "system", "content": system}] + messages
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = groq.post(
             headers={
                 "Content-Type":  "application/json",
                 "Authorization": f"Bearer {GROQ_KEY}",
@@ -156,31 +255,211 @@ def ask_groq(system: str, messages: list, max_tokens: int = 1500):
                 "messages":    groq_messages,
                 "temperature": 0.7,
             },
-            timeout=30
         )
         if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"], True
-        return f"Groq error {response.status_code}: {response.text}", False
+            body = response.json()
+            return body["choices"][0]["message"]["content"], True, groq_usage(body)
+        return f"Groq error {response.status_code}: {response.text}", False, None
     except Exception as e:
-        return f"Request failed: {str(e)}", False
+        return f"Request failed: {str(e)}", False, None
+
+
+def groq_usage(body):
+    usage = body.get("usage") or (body.get("x_groq") or {}).get("usage")
+    if not usage:
+        return None
+    return {"input": usage.get("prompt_tokens"), "output": usage.get("completion_tokens")}
+
+
+# ── Token accounting ──────────────────────────────────────────────
+tokens = TokenMeter()
+
+def record_tokens(route, engine, ok, system, messages, text, usage):
+    """Count one provider call against route. Provider usage wins; missing
+    counts are estimated locally. Failed calls with no usage cost nothing."""
+    usage = {k: v for k, v in (usage or {}).items() if v is not None}
+    if not usage and not ok:
+        return
+    tokens.record(route, engine,
+                  usage.get("input", estimate(system) + estimate_messages(messages)),
+                  usage.get("output", estimate(text)),
+                  estimated=len(usage) < 2)
 
 
 # ── Smart AI router ───────────────────────────────────────────────
-def ask_ai(system: str, messages: list, max_tokens: int = 1500):
-    """Try Claude first. If it fails for any reason, use Groq."""
-    text, ok = ask_claude(system, messages, max_tokens)
-    if ok and text:
-        print("[agent] ✅ Claude responded")
-        return text, "claude"
+# Claude first, Groq on failure — or as a hedge once Claude runs past its p95
+router = Router([("claude", ask_claude), ("groq", ask_groq)],
+                workers=int(os.getenv("LLM_ROUTER_WORKERS", 16)), on_usage=record_tokens)
+
+
+def ask_ai(system: str, messages: list, max_tokens: int = 1500, route: str = "analyze"):
+    """Try Claude first. If it fails, is circuit-broken or runs slow, use Groq.
+    Returns (text, engine, ok)"""
+    text, engine, ok = router.ask(system, messages, max_tokens, tag=route)
+    print(f"[agent] {'✅' if ok else '⚠'} {engine.capitalize()} responded")
+    return text, engine, ok
+
+
+# ── Streaming (token by token) ────────────────────────────────────
+stream_stats = {"streams": 0, "fallbacks": 0, "resets": 0}
+_ttft        = deque(maxlen=200)   # recent time-to-first-token, ms
+
+
+class GroqError(Exception):
+    pass
+
 
-    print("[agent] ⚡ Using Groq fallback")
-    text, ok = ask_groq(system, messages, max_tokens)
-    return text, "groq"
+def sse_lines(response):
+    """Parsed JSON of every `data:` line in a streaming response."""
+    response.encoding = "utf-8"
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if line and line.startswith("data:") and line[5:].strip() != "[DONE]":
+            yield json.loads(line[5:])
+
+
+def stream_claude(system: str, messages: list, max_tokens: int = 1500, usage: dict = None):
+    """Yields text deltas from Claude's streaming API; raises on any failure.
+    Token counts are written into usage as they arrive."""
+    usage = {} if usage is None else usage
+    if not ANTHROPIC_KEY:
+        raise RuntimeError("no ANTHROPIC_API_KEY")
+    with claude.post(
+        headers={
+            "Content-Type":      "application/json",
+            "x-api-key":         ANTHROPIC_KEY,
+            "anthropic-version": "2023-06-01",
+        },
+        json={
+            "model":      CLAUDE_MODEL,
+            "max_tokens": max_tokens,
+            "system":     system,
+            "messages":   messages,
+            "stream":     True,
+        },
+        stream=True,
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"status {response.status_code}")
+        for event in sse_lines(response):
+            if event.get("type") == "content_block_delta":
+                yield event["delta"].get("text", "")
+            elif event.get("type") == "message_start":
+                usage["input"] = ((event.get("message") or {}).get("usage") or {}).get("input_tokens")
+            elif event.get("type") == "message_delta":
+                usage["output"] = (event.get("usage") or {}).get("output_tokens")
+            elif event.get("type") == "error":
+                raise RuntimeError(event["error"].get("message"))
+
+
+def stream_groq(system: str, messages: list, max_tokens: int = 1500, usage: dict = None):
+    """Yields text deltas from Groq; raises GroqError with the same message
+    ask_groq would return on failure. Token counts are written into usage."""
+    usage = {} if usage is None else usage
+    if not GROQ_KEY:
+        raise GroqError("⚠ No AI available. Add GROQ_API_KEY to .env — free at console.groq.com")
+    try:
+        with groq.post(
+            headers={
+                "Content-Type":  "application/json",
+                "Authorization": f"Bearer {GROQ_KEY}",
+            },
+            json={
+                "model":       GROQ_MODEL,
+                "max_tokens":  max_tokens,
+                "messages":    [{"role": "system", "content": system}] + messages,
+                "temperature":    0.7,
+                "stream":         True,
+                "stream_options": {"include_usage": True},
+            },
+            stream=True,
+        ) as response:
+            if response.status_code != 200:
+                raise GroqError(f"Groq error {response.status_code}: {response.text}")
+            for chunk in sse_lines(response):
+                usage.update(groq_usage(chunk) or {})
+                yield (chunk.get("choices") or [{}])[0].get("delta", {}).get("content") or ""
+    except GroqError:
+        raise
+    except Exception as e:
+        raise GroqError(f"Request failed: {str(e)}")
+
+
+def stream_ai(system: str, messages: list, max_tokens: int = 1500, route: str = "analyze/stream"):
+    """ask_ai as a stream of (event, data): "token" frames as text arrives, then
+    one "done" frame naming the engine (and whether it succeeded). Claude goes
+    first; if it fails — even part-way — Groq answers instead, after a "reset"
+    frame telling the client to drop the partial Claude text."""
+    stream_stats["streams"] += 1
+    started = time.perf_counter()
+    first   = None
+
+    def token(text):
+        nonlocal first
+        if first is None:
+            first = (time.perf_counter() - started) * 1000
+            _ttft.append(first)
+        return "token", {"text": text}
+
+    engine, ok = "claude", True
+    health     = router.health["claude"]
+    usage, out = {}, []
+    try:
+        if not health.allow():
+            raise RuntimeError("circuit open")
+        for text in stream_claude(system, messages, max_tokens, usage):
+            if text:
+                out.append(text)
+                yield token(text)
+        if not out:
+            raise RuntimeError("empty response")
+        health.record(time.perf_counter() - started, True)
+        record_tokens(route, "claude", True, system, messages, "".join(out), usage)
+        print("[agent] ✅ Claude streamed")
+    except Exception as e:
+        if str(e) != "circuit open":
+            health.record(time.perf_counter() - started, False)
+            record_tokens(route, "claude", bool(out), system, messages, "".join(out), usage)
+        print(f"[agent] Claude stream failed: {e} — falling back to Groq")
+        stream_stats["fallbacks"] += 1
+        if out:
+            stream_stats["resets"] += 1
+            yield "reset", {}
+        engine     = "groq"
+        usage, out = {}, []
+        try:
+            for text in stream_groq(system, messages, max_tokens, usage):
+                if text:
+                    out.append(text)
+                    yield token(text)
+        except GroqError as e:
+            ok = False
+            yield token(str(e))
+        record_tokens(route, "groq", ok, system, messages, "".join(out), usage)
+
+    yield "done", {
+        "engine":   engine,
+        "ok":       ok,
+        "ttft_ms":  round(first, 1) if first is not None else None,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def ttft_stats():
+    recent = sorted(_ttft)
+    if not recent:
+        return {"p50_ms": None, "p95_ms": None}
+    return {"p50_ms": round(recent[len(recent) // 2], 1),
+            "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 1)}
 
 
 # ── Build system prompt ───────────────────────────────────────────
-def build_system_prompt(ticker: str, data: dict) -> str:
-    return f"""You are an expert investment analyst embedded in QuantDesk, a live trading terminal.
+def build_system_prompt(ticker: str, data: dict, compact: bool = False) -> str:
+    """compact drops fields with no value and cuts the description to a line,
+    for prompts that would not fit PROMPT_TOKEN_BUDGET otherwise."""
+    about  = data.get('description')
+    if compact:
+        about = clip(about or "", 40)
+    prompt = f"""You are an expert investment analyst embedded in QuantDesk, a live trading terminal.
 
 You have access to the following LIVE data for {ticker} ({data.get('name')}):
 
@@ -207,7 +486,7 @@ ANALYST DATA:
 - Next Earnings: {data.get('next_earnings')}
 
 SECTOR: {data.get('sector')} — {data.get('industry')}
-ABOUT:  {data.get('description')}
+ABOUT:  {about}
 
 RULES:
 - Use this live data directly — never say you lack real-time access
@@ -216,50 +495,127 @@ RULES:
 - Always end an analysis with a clear BUY / HOLD / SELL signal in bold
 - For simple questions, answer in 2-4 sentences
 - For full analysis, use headers and structure"""
+    if compact:
+        prompt = "\n".join(l for l in prompt.splitlines() if not l.rstrip().endswith(("N/A", "None", "ABOUT:")))
+    return prompt
 
 
 # ── ROUTE 1: Analyze ─────────────────────────────────────────────
-@app.route("/agent/analyze", methods=["POST"])
-def analyze():
-    body     = request.json or {}
-    ticker   = body.get("ticker", "").upper()
+answers = AnswerCache()   # same ticker + question + history over the same data → no LLM call
+
+def analysis_prompt(ticker: str, body: dict):
+    """(system, messages, answer cache key) for an analyze request, fitted to
+    PROMPT_TOKEN_BUDGET: long history messages are clipped; if that is not
+    enough the system prompt is compacted and the oldest turns are replaced
+    by a one-line-each summary."""
     question = body.get("question", f"Give me a full investment analysis for {ticker}.")
     history  = body.get("history", [])
 
-    if not ticker:
-        return jsonify({"error": "ticker is required"}), 400
-
     print(f"\n[agent] {ticker}: {question[:60]}...")
 
-    data   = get_full_stock_data(ticker)
+    data   = get_snapshot(ticker)
     system = build_system_prompt(ticker, data)
 
     messages = []
     for m in history[-6:]:
         if m.get("role") in ("user", "assistant"):
             messages.append({"role": m["role"], "content": m["content"]})
-    messages.append({"role": "user", "content": question})
+    key = answers.key(ticker, question, messages, data)
 
-    answer, engine = ask_ai(system, messages)
+    budget        = PROMPT_TOKEN_BUDGET - estimate_messages([{"content": question}])
+    kept, dropped = fit_history(messages, budget - estimate(system))
+    if dropped:
+        system        = build_system_prompt(ticker, data, compact=True)
+        kept, dropped = fit_history(messages, budget - estimate(system))
+        tokens.prompts["compacted"] += 1
+    if kept != messages:
+        tokens.prompts["history_trimmed"] += 1
+    if dropped:
+        tokens.prompts["messages_dropped"] += len(dropped)
+        system += "\n\n" + summarize(dropped)
+
+    messages = kept + [{"role": "user", "content": question}]
+    return system, messages, key
+
+
+@app.route("/agent/analyze", methods=["POST"])
+def analyze():
+    body   = request.json or {}
+    ticker = body.get("ticker", "").upper()
+
+    if not ticker:
+        return jsonify({"error": "ticker is required"}), 400
+
+    system, messages, key = analysis_prompt(ticker, body)
+    cached = answers.get(key)
+    if cached:
+        print(f"[agent] ♻ Cached answer for {ticker}")
+        answer, engine = cached
+    else:
+        answer, engine, ok = ask_ai(system, messages)
+        if ok:
+            answers.put(key, answer, engine)
 
     return jsonify({
         "ticker": ticker,
         "answer": answer,
         "engine": f"{engine}+yfinance",
+        "cached": bool(cached),
     })
 
 
+@app.route("/agent/analyze/stream", methods=["POST"])
+def analyze_stream():
+    """Same request as /agent/analyze, answered as Server-Sent Events: "token"
+    frames while the model writes, a "reset" frame if Claude fails part-way and
+    Groq takes over, and a final "done" frame with the engine and timings."""
+    body   = request.json or {}
+    ticker = body.get("ticker", "").upper()
+
+    if not ticker:
+        return jsonify({"error": "ticker is required"}), 400
+
+    system, messages, key = analysis_prompt(ticker, body)
+    cached = answers.get(key)
+
+    def events():
+        if cached:
+            print(f"[agent] ♻ Cached answer for {ticker}")
+            yield sse("token", {"text": cached[0]})
+            yield sse("done", {"engine": f"{cached[1]}+yfinance", "cached": True, "ticker": ticker})
+            return
+        text = []
+        for event, data in stream_ai(system, messages):
+            if event == "token":
+                text.append(data["text"])
+            elif event == "reset":
+                text.clear()
+            elif event == "done":
+                if data.pop("ok"):
+                    answers.put(key, "".join(text), data["engine"])
+                data = dict(data, ticker=ticker, engine=f"{data['engine']}+yfinance", cached=False)
+            yield sse(event, data)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 # ── ROUTE 2: Compare stocks ───────────────────────────────────────
 @app.route("/agent/compare", methods=["POST"])
 def compare():
     body    = request.json or {}
-    tickers = [t.upper() for t in body.get("tickers", [])]
+    tickers = [t.upper() for t in body.get("tickers", []) if isinstance(t, str)]
 
     if len(tickers) < 2:
         return jsonify({"error": "Provide at least 2 tickers"}), 400
+    if len(tickers) > MAX_COMPARE:
+        return jsonify({"error": f"Provide at most {MAX_COMPARE} tickers"}), 400
 
     print(f"[agent] Comparing {tickers}")
-    snapshots = {t: get_full_stock_data(t) for t in tickers}
+    # One async round for every ticker's fundamentals; the snapshots below then hit the cache
+    gather({"fundamentals": (lambda: market.fundamentals(tickers), {})})
+    with ThreadPoolExecutor(max_workers=min(len(tickers), MAX_COMPARE)) as executor:
+        snapshots = dict(zip(tickers, executor.map(get_snapshot, tickers)))
 
     rows = []
     for t, d in snapshots.items():
@@ -274,7 +630,7 @@ def compare():
     system   = "You are an expert investment analyst. Compare stocks clearly using a markdown table and give a final recommendation."
     question = "Compare these stocks:\n\n" + "\n".join(rows) + "\n\nCreate a comparison table and tell me which one to invest in and why."
 
-    answer, engine = ask_ai(system, [{"role": "user", "content": question}])
+    answer, engine, _ = ask_ai(system, [{"role": "user", "content": question}], route="compare")
     return jsonify({"answer": answer, "engine": f"{engine}+yfinance"})
 
 
@@ -287,6 +643,13 @@ def health():
         "groq_key":   "✅ Set" if GROQ_KEY      else "❌ Missing",
         "primary":    "claude" if ANTHROPIC_KEY else "groq" if GROQ_KEY else "none",
         "fallback":   "groq"   if GROQ_KEY      else "none",
+        "snapshots":  dict(snapshot_stats, cached=len(_snapshots)),
+        "market":     market.lookups.stats,
+        "transport":  {"claude": claude.stats(), "groq": groq.stats()},
+        "streaming":  dict(stream_stats, ttft=ttft_stats()),
+        "answers":    answers.report(),
+        "tokens":     tokens.report(),
+        "router":     dict(router.stats, **{n: h.stats() for n, h in router.health.items()}),
     })
 
 
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+ANSWER_TTL        = int(os.getenv("ANSWER_TTL", 900))              # seconds an answer is reused
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1000))
+ANSWER_SIMILARITY = float(os.getenv("ANSWER_SIMILARITY", 2))       # word-set Jaccard for near-duplicates, e.g. 0.85; >1 disables
+PRICE_STEP        = 0.01                                           # prices within ~1% share a fingerprint
+
+# Words that change what a question asks — two questions differing in any of these never match
+MEANING_WORDS = {
+    "buy", "sell", "hold", "short", "long", "not", "no", "dont", "don", "never", "without",
+    "risk", "risks", "risky", "upside", "downside", "bull", "bear", "bullish", "bearish",
+    "overvalued", "undervalued", "cheap", "expensive", "up", "down", "rise", "fall", "more", "less",
+    "best", "worst", "why", "when", "how", "what", "should", "target", "dividend", "earnings",
+}
+
+
+def normalize(question):
+    return " ".join(re.sub(r"[^a-z0-9.%$]+", " ", question.lower()).split()).strip(" .")
+
+
+def digest(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def fingerprint(data):
+    """Digest of the snapshot the prompt was built from. The price is bucketed
+    in PRICE_STEP steps so ordinary ticks keep answers reusable; any change to
+    fundamentals, analyst fields or the earnings date gives a new digest."""
+    fields = {k: v for k, v in data.items() if k not in ("price", "change_pct")}
+    price  = data.get("price")
+    if price:
+        fields["price_bucket"] = round(math.log(price) / math.log1p(PRICE_STEP))
+    return digest(fields)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def similar(a, b, threshold):
+    """Near-duplicate word sets: overlap of at least threshold and no
+    MEANING_WORDS in one but not the other."""
+    return not (a ^ b) & MEANING_WORDS and jaccard(a, b) >= threshold
+
+
+# ── AGENT ANSWER CACHE ────────────────────────────────────────────
+class AnswerCache:
+    """LRU of finished agent answers, each kept for ANSWER_TTL seconds.
+
+    Answers are grouped by (ticker, history digest, snapshot fingerprint), so
+    they are only reused for the same conversation over the same data. Inside
+    a group a question matches exactly after normalize(), or — failing that —
+    the closest earlier question whose word set overlaps by ANSWER_SIMILARITY
+    (off by default) and asks the same thing — see MEANING_WORDS.
+    """
+
+    def __init__(self, ttl=ANSWER_TTL, size=ANSWER_CACHE_SIZE, similarity=ANSWER_SIMILARITY):
+        self.ttl        = ttl
+        self.size       = size
+        self.similarity = similarity
+        self._entries   = OrderedDict()   # (group, question) -> {"answer", "engine", "at", "words"}
+        self._groups    = {}              # group -> set of questions, for near-duplicate lookups
+        self._lock      = threading.Lock()
+        self.stats      = {"hits": 0, "near_hits": 0, "misses": 0, "stored": 0, "expired": 0}
+
+    @staticmethod
+    def key(ticker, question, history, data):
+        return (ticker, digest(history), fingerprint(data)), normalize(question)
+
+    def get(self, key):
+        """(answer, engine) or None."""
+        group, question = key
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.similarity <= 1:
+                words  = set(question.split())
+                scored = [(jaccard(words, self._entries[(group, q)]["words"]), q) for q in self._groups.get(group, ())
+                          if similar(words, self._entries[(group, q)]["words"], self.similarity)]
+                best   = max(scored, default=(0, None))
+                if best[1] is not None:
+                    key, entry = (group, best[1]), self._entries[(group, best[1])]
+            if entry is not None and now - entry["at"] >= self.ttl:
+                self._drop(key)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits" if key[1] == question else "near_hits"] += 1
+            return entry["answer"], entry["engine"]
+
+    def put(self, key, answer, engine):
+        group, question = key
+        with self._lock:
+            self._entries[key] = {"answer": answer, "engine": engine, "at": time.time(),
+                                  "words": set(question.split())}
+            self._entries.move_to_end(key)
+            self._groups.setdefault(group, set()).add(question)
+            self.stats["stored"] += 1
+            while len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        group, question = key
+        self._entries.pop(key, None)
+        questions = self._groups.get(group)
+        if questions is not None:
+            questions.discard(question)
+            if not questions:
+                del self._groups[group]
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, cached=len(self._entries))
@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+try:
+    import fcntl
+except ImportError:   # Windows — fall back to in-process locking only
+    fcntl = None
+
+BAR_STORE_DIR       = os.getenv("BAR_STORE_DIR", str(Path(__file__).resolve().parent.parent / "data" / "bars"))
+BAR_REFRESH_SECONDS = int(os.getenv("BAR_REFRESH_SECONDS", 60))   # min gap between upstream checks
+BAR_MIN_HISTORY     = os.getenv("BAR_MIN_HISTORY", "1y")           # daily bars fetched on first sight
+DOWNLOAD_BATCH      = 50                                          # tickers per yf.download call
+ADJUST_RTOL         = 1e-5                                        # stored vs re-fetched close before a full refetch
+
+COLUMNS    = ["Open", "High", "Low", "Close", "Volume"]
+DAY_NS     = 86_400 * 10**9
+OVERLAP_NS = 5 * DAY_NS   # appends re-fetch this far back so completed bars overlap
+
+
+def period_start(period, now=None):
+    """Earliest timestamp (ns, UTC) a yfinance-style period needs on disk.
+
+    "Nd" periods mean N trading days, so they reach back far enough in
+    calendar time to cover weekends and holidays.
+    """
+    now = now or time.time()
+    if period.endswith("mo"):
+        n, unit = int(period[:-2]), "mo"
+    else:
+        n, unit = int(period[:-1]), period[-1]
+    days = {"d": n * 1.5 + 4, "mo": n * 31 + 1, "y": n * 366}.get(unit)
+    if days is None:
+        raise ValueError(f"Unsupported period {period!r}")
+    return int((now - days * 86_400) * 10**9)
+
+
+# ── OHLCV BAR STORE ───────────────────────────────────────────────
+class BarStore:
+    """Local columnar OHLCV cache shared by every QuantDesk service.
+
+    Each symbol/interval is a directory of fixed-width column files —
+    ts.i8 (UTC ns) and one .f8 file per OHLCV column — read through
+    np.memmap, plus a meta.json with the row count, timezone, the earliest
+    date fetched and when upstream was last asked. Only bars after the
+    stored watermark are downloaded; the last stored bar is re-fetched
+    because today's daily bar keeps changing until the close.
+
+    Prices are split- and dividend-adjusted, and upstream re-adjusts all
+    earlier bars after such an event. Each append therefore re-fetches a few
+    completed bars too; if they no longer match what is stored, the symbol's
+    whole history is downloaded again rather than leaving a price cliff at
+    the append boundary.
+
+    Files are guarded by flock, so several gunicorn workers and services can
+    share one BAR_STORE_DIR.
+    """
+
+    def __init__(self, root=BAR_STORE_DIR, refresh_seconds=BAR_REFRESH_SECONDS):
+        self.root            = Path(root)
+        self.refresh_seconds = refresh_seconds
+        self._locks          = {}
+        self._guard          = threading.Lock()
+        self.stats           = {"reads": 0, "upstream_calls": 0, "full_fetches": 0,
+                                "incremental_fetches": 0, "readjusted": 0, "bars_written": 0}
+
+    # ── public API ────────────────────────────────────────────────
+    def get(self, symbol, period="1y", interval="1d"):
+        """OHLCV DataFrame for one symbol, like Ticker.history(period, interval)."""
+        return self.get_many([symbol], period, interval)[symbol.upper()]
+
+    def get_many(self, symbols, period="1y", interval="1d", max_age=None):
+        """{symbol: DataFrame} for many symbols; anything stale or missing is
+        fetched with batched multi-ticker downloads. max_age (seconds)
+        overrides refresh_seconds for how recently upstream must have been
+        asked."""
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        self.sync(symbols, period, interval, max_age)
+        return {s: self.read(s, period, interval) for s in symbols}
+
+    def sync(self, symbols, period="1y", interval="1d", max_age=None):
+        """Bring symbols up to date on disk without reading them back."""
+        since = period_start(period)
+        stale = [s for s in symbols if self._plan(s, interval, since, max_age)]
+        if not stale:
+            return
+        with ExitStack() as stack:
+            for s in sorted(stale):   # fixed order so concurrent callers cannot deadlock
+                stack.enter_context(self._locked(s, interval))
+            # Re-plan under the lock: another thread or worker may have synced meanwhile
+            plans = {s: self._plan(s, interval, since, max_age) for s in stale}
+            full  = [s for s, p in plans.items() if p == "full"]
+            incr  = [s for s, p in plans.items() if p == "append"]
+            if full:
+                # Daily history is cheap; take at least BAR_MIN_HISTORY so
+                # later, longer periods are served without another full fetch
+                start = min(since, period_start(BAR_MIN_HISTORY)) if interval == "1d" else since
+                self.stats["full_fetches"] += len(full)
+                frames = self._download(full, start, interval)
+                for s in full:
+                    self._write(s, interval, frames.get(s), since=start, replace=True)
+            if incr:
+                self.stats["incremental_fetches"] += len(incr)
+                start  = min(self._meta(s, interval)["last_ts"] for s in incr) - OVERLAP_NS
+                frames = self._download(incr, start, interval)
+                redo   = [s for s in incr if self._readjusted(s, interval, frames.get(s))]
+                for s in incr:
+                    if s not in redo:
+                        self._write(s, interval, frames.get(s), replace=False)
+                if redo:
+                    print(f"  [bars] History re-adjusted upstream for {', '.join(redo)} — refetching")
+                    self.stats["readjusted"] += len(redo)
+                    start  = min(self._meta(s, interval)["since"] for s in redo)
+                    frames = self._download(redo, start, interval)
+                    for s in redo:
+                        if s in frames:
+                            self._write(s, interval, frames[s], since=start, replace=True)
+                        else:   # keep the old bars rather than an empty store; retry after the refresh gap
+                            self._write(s, interval, None)
+
+    def arrays(self, symbol, period="1y", interval="1d", columns=COLUMNS):
+        """(ts, {column: values}, tz) for the period, as plain NumPy arrays.
+
+        ts is UTC nanoseconds. The period is located with a binary search on
+        the memory-mapped timestamps and only that slice is copied out.
+        """
+        symbol = symbol.upper()
+        self.sync([symbol], period, interval)
+        return self._slice(symbol, period, interval, columns)
+
+    def read(self, symbol, period="1y", interval="1d"):
+        """What is on disk for the period, without asking upstream."""
+        ts, cols, tz = self._slice(symbol.upper(), period, interval, COLUMNS)
+        index = pd.DatetimeIndex(ts, tz="UTC").tz_convert(tz)
+        return pd.DataFrame(cols, index=index, columns=COLUMNS)
+
+    def _slice(self, symbol, period, interval, columns):
+        self.stats["reads"] += 1
+        with self._locked(symbol, interval, exclusive=False):
+            meta = self._meta(symbol, interval)
+            if not meta or not meta["rows"]:
+                return np.empty(0, dtype=np.int64), {c: np.empty(0) for c in columns}, "UTC"
+            cols  = self._columns(symbol, interval, meta["rows"])
+            ts    = cols["ts"]
+            start = int(np.searchsorted(ts, period_start(period)))
+            if period.endswith("d") and start < len(ts):
+                # Last N distinct trading dates, counted in exchange-local time
+                days  = pd.DatetimeIndex(ts[start:], tz="UTC").tz_convert(meta["tz"]).normalize()
+                first = days.unique()[-int(period[:-1]):][0]
+                start += int(np.searchsorted(days.as_unit("ns").asi8, first.value))
+            # Copy while the lock is held — a writer may truncate the files later
+            return np.array(ts[start:]), {c: np.array(cols[c][start:]) for c in columns}, meta["tz"]
+
+    # ── internals ─────────────────────────────────────────────────
+    def _dir(self, symbol, interval):
+        return self.root / interval / symbol.upper()
+
+    @contextmanager
+    def _locked(self, symbol, interval, exclusive=True):
+        d = self._dir(symbol, interval)
+        d.mkdir(parents=True, exist_ok=True)
+        key = (symbol, interval)
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.RLock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(d / ".lock", "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _meta(self, symbol, interval):
+        try:
+            return json.loads((self._dir(symbol, interval) / "meta.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _plan(self, symbol, interval, since, max_age=None):
+        meta = self._meta(symbol, interval)
+        if meta is None or meta["since"] > since + DAY_NS:
+            return "full"
+        if not meta["rows"]:
+            # Nothing upstream last time — only ask again after the refresh gap
+            return "full" if time.time() - meta["fetched_at"] >= self.refresh_seconds else None
+        if time.time() - meta["fetched_at"] >= (self.refresh_seconds if max_age is None else max_age):
+            return "append"
+        return None
+
+    def _readjusted(self, symbol, interval, frame):
+        """True when frame's completed bars disagree with the stored ones —
+        upstream has re-adjusted the history for a split or dividend."""
+        meta = self._meta(symbol, interval)
+        if frame is None or frame.empty or not meta or meta["rows"] < 2:
+            return False
+        cols  = self._columns(symbol, interval, meta["rows"])
+        index = frame.index if frame.index.tz is not None else frame.index.tz_localize(meta["tz"])
+        # The last stored bar may still be provisional, so it is not compared
+        _, old, new = np.intersect1d(cols["ts"][:-1], index.as_unit("ns").asi8, return_indices=True)
+        if not len(old):
+            return False
+        return not np.allclose(cols["Close"][:-1][old], frame["Close"].to_numpy(dtype=np.float64)[new],
+                               rtol=ADJUST_RTOL, equal_nan=True)
+
+    def _columns(self, symbol, interval, rows):
+        d = self._dir(symbol, interval)
+        cols = {"ts": np.memmap(d / "ts.i8", dtype=np.int64, mode="r", shape=(rows,))}
+        for c in COLUMNS:
+            cols[c] = np.memmap(d / f"{c.lower()}.f8", dtype=np.float64, mode="r", shape=(rows,))
+        return cols
+
+    def _download(self, symbols, start_ns, interval):
+        start  = pd.Timestamp(start_ns, unit="ns", tz="UTC").strftime("%Y-%m-%d")
+        frames = {}
+        for i in range(0, len(symbols), DOWNLOAD_BATCH):
+            batch = symbols[i:i + DOWNLOAD_BATCH]
+            self.stats["upstream_calls"] += 1
+            try:
+                if len(batch) == 1:
+                    frames[batch[0]] = yf.Ticker(batch[0]).history(start=start, interval=interval)
+                    continue
+                df = yf.download(batch, start=start, interval=interval, group_by="ticker",
+                                 auto_adjust=True, progress=False, threads=True, ignore_tz=False)
+                for s in batch:
+                    if s in df.columns.get_level_values(0):
+                        frames[s] = df[s].dropna(how="all")
+            except Exception as e:
+                print(f"  [!] Bar download failed for {', '.join(batch)}: {e}")
+        return frames
+
+    def _write(self, symbol, interval, frame, since=None, replace=False):
+        d    = self._dir(symbol, interval)
+        meta = self._meta(symbol, interval) or {"rows": 0, "tz": "America/New_York", "since": since}
+        if replace:
+            meta.update(rows=0, since=since)
+        rows = meta["rows"]
+        if frame is not None and not frame.empty:
+            frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+            index = frame.index if frame.index.tz is not None else frame.index.tz_localize(meta["tz"])
+            new_ts = index.as_unit("ns").asi8
+            if rows:
+                # Overwrite from the first re-fetched bar onward
+                rows = int(np.searchsorted(self._columns(symbol, interval, rows)["ts"], new_ts[0]))
+            self._append(d / "ts.i8", rows * 8, new_ts.astype(np.int64))
+            for c in COLUMNS:
+                self._append(d / f"{c.lower()}.f8", rows * 8, frame[c].to_numpy(dtype=np.float64))
+            rows += len(frame)
+            meta.update(tz=str(index.tz), last_ts=int(new_ts[-1]))
+            self.stats["bars_written"] += len(frame)
+        meta.update(rows=rows, fetched_at=time.time())
+        tmp = d / f"meta.json.tmp{os.getpid()}"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, d / "meta.json")
+
+    @staticmethod
+    def _append(path, offset, values):
+        with open(path, "ab") as fh:
+            fh.truncate(offset)
+            fh.write(np.ascontiguousarray(values).tobytes())
+
+
+bars = BarStore()
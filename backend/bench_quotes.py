@@ -0,0 +1,70 @@
+"""Compare per-symbol and bulk quote fetching against live Yahoo data.
+
+    python bench_quotes.py            # all of UNIVERSE
+    python bench_quotes.py 30 NVDA,AAPL,...
+
+"per-symbol" is the old /api/stocks path: one Ticker.history(period="2d")
+per symbol on a 10-thread pool. "bulk" is the bar store path used now:
+multi-ticker yf.download calls of DOWNLOAD_BATCH symbols each. Both start
+cold (the bulk run uses a throwaway BAR_STORE_DIR).
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance as yf
+
+from bar_store import DOWNLOAD_BATCH, BarStore
+from market_data import snapshot
+
+UNIVERSE = (
+    "AAPL MSFT NVDA AMZN GOOGL META TSLA AVGO BRK-B JPM LLY V UNH XOM MA JNJ PG HD COST MRK "
+    "ABBV CVX CRM BAC NFLX AMD PEP KO TMO WMT ADBE LIN MCD CSCO ACN ABT ORCL DIS WFC INTC "
+    "QCOM DHR VZ INTU CMCSA TXN AMGN PFE NKE IBM PM UNP CAT SPGI NOW GE HON AMAT LOW UBER "
+    "COP BA RTX ISRG T NEE GS BKNG ELV PLD SBUX MDT BLK DE TJX AXP SYK LMT GILD MDLZ ADI "
+    "VRTX MMC CVS LRCX ADP REGN SCHW CI PANW ZTS MU BSX C MO SO COIN"
+).split()
+
+
+def per_symbol(symbols):
+    def one(symbol):
+        try:
+            hist = yf.Ticker(symbol).history(period="2d")
+        except Exception as e:
+            print(f"  [!] {symbol}: {e}")
+            return symbol, None
+        return symbol, snapshot(hist) if not hist.empty else None
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        quotes = dict(executor.map(one, symbols))
+    return quotes, len(symbols)
+
+
+def bulk(symbols):
+    with tempfile.TemporaryDirectory() as root:
+        store  = BarStore(root)
+        frames = store.get_many(symbols, period="2d")
+        quotes = {s: snapshot(df) if not df.empty else None for s, df in frames.items()}
+        return quotes, store.stats["upstream_calls"]
+
+
+def run(name, fn, symbols):
+    start = time.perf_counter()
+    quotes, calls = fn(symbols)
+    took  = time.perf_counter() - start
+    found = sum(q is not None for q in quotes.values())
+    print(f"  {name:<11} {took:7.2f}s  {calls:4d} upstream requests  {found}/{len(symbols)} quotes")
+    return quotes
+
+
+if __name__ == "__main__":
+    n       = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    symbols = sys.argv[2].upper().split(",") if len(sys.argv) > 2 else UNIVERSE[:n]
+    print("=" * 52)
+    print(f"  Quote fetch — {len(symbols)} symbols, batch size {DOWNLOAD_BATCH}")
+    print("=" * 52)
+    a = run("per-symbol", per_symbol, symbols)
+    b = run("bulk", bulk, symbols)
+    drift = [s for s in symbols if a.get(s) and b.get(s) and abs(a[s]["price"] - b[s]["price"]) > 1e-6]
+    if drift:
+        print(f"  Prices differ for {', '.join(drift)} (the market may have moved between runs)")
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+HEDGE_DEFAULT    = float(os.getenv("LLM_HEDGE_AFTER", 8))      # seconds, until there is enough latency history
+HEDGE_MIN        = 1.0
+HEDGE_SAMPLES    = 5                                           # successes needed before trusting the p95
+WINDOW           = 100                                         # recent calls kept per provider
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 3))   # consecutive failures that open the breaker
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+
+
+class ProviderHealth:
+    """Rolling latency / error window and circuit breaker for one provider.
+
+    After BREAKER_FAILURES failures in a row the breaker opens and allow()
+    says no for BREAKER_COOLDOWN seconds; then a single trial call is let
+    through — success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name):
+        self.name       = name
+        self._calls     = deque(maxlen=WINDOW)   # (seconds, ok)
+        self._failures  = 0
+        self._opened_at = None
+        self._lock      = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self._calls.append((seconds, ok))
+            if ok:
+                self._failures, self._opened_at = 0, None
+            else:
+                self._failures += 1
+                if self._failures >= BREAKER_FAILURES:
+                    if self._opened_at is None:
+                        print(f"[router] Circuit open for {self.name} — skipping it for {BREAKER_COOLDOWN:.0f}s")
+                    self._opened_at = time.time()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.time() - self._opened_at >= BREAKER_COOLDOWN:
+                self._opened_at = time.time()   # one trial per cooldown
+                return True
+            return False
+
+    def p95(self):
+        with self._lock:
+            ok = sorted(s for s, good in self._calls if good)
+        if len(ok) < HEDGE_SAMPLES:
+            return None
+        return ok[min(len(ok) - 1, int(len(ok) * 0.95))]
+
+    def hedge_after(self):
+        p95 = self.p95()
+        return HEDGE_DEFAULT if p95 is None else max(HEDGE_MIN, p95)
+
+    def stats(self):
+        with self._lock:
+            calls = list(self._calls)
+            state = "closed" if self._opened_at is None else "open"
+        ok = sorted(s for s, good in calls if good)
+        p95 = self.p95()
+        return {
+            "calls":      len(calls),
+            "error_rate": round(1 - len(ok) / len(calls), 3) if calls else None,
+            "p50_s":      round(ok[len(ok) // 2], 2) if ok else None,
+            "p95_s":      round(p95, 2) if p95 is not None else None,
+            "breaker":    state,
+        }
+
+
+# ── HEDGED LLM ROUTER ─────────────────────────────────────────────
+class Router:
+    """Routes a completion to providers in preference order, by health.
+
+    Providers are (name, call) pairs with call(system, messages, max_tokens)
+    -> (text, ok, usage). The first available provider is asked; if it fails the
+    next starts at once, and if it is merely slow — no answer within its own
+    rolling p95 — the next is fired as a hedge and whichever succeeds first
+    wins. Providers whose breaker is open are skipped. The last provider
+    always runs if nothing else can, and its answer (even an error message)
+    is returned with ok=False, as ask_ai always did. Every finished call,
+    hedge losers included, is reported to on_usage(tag, name, ok, system,
+    messages, text, usage).
+    """
+
+    def __init__(self, providers, workers=16, on_usage=None):
+        self.providers = list(providers)
+        self.health    = {name: ProviderHealth(name) for name, _ in self.providers}
+        self._pool     = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-router")
+        self.on_usage  = on_usage
+        self.stats     = {"requests": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0, "skipped": 0}
+
+    def _call(self, tag, name, call, system, messages, max_tokens):
+        started = time.perf_counter()
+        try:
+            text, ok, usage = call(system, messages, max_tokens)
+        except Exception as e:
+            text, ok, usage = f"Request failed: {e}", False, None
+        ok = bool(ok and text)
+        self.health[name].record(time.perf_counter() - started, ok)
+        if self.on_usage:
+            self.on_usage(tag, name, ok, system, messages, text or "", usage)
+        return text, ok
+
+    def ask(self, system, messages, max_tokens=1500, tag=None):
+        """(text, engine name, ok)."""
+        self.stats["requests"] += 1
+        queue = [(n, c) for n, c in self.providers if self.health[n].allow()]
+        self.stats["skipped"] += len(self.providers) - len(queue)
+        if not queue:
+            queue = self.providers[-1:]
+
+        running = {}   # future -> provider name
+        last    = None
+        hedge   = None
+        while queue or running:
+            if queue and not running:
+                if last is not None:
+                    self.stats["fallbacks"] += 1
+                    print(f"[router] ⚡ {last[0]} failed — falling back to {queue[0][0]}")
+                name, call = queue.pop(0)
+                running[self._pool.submit(self._call, tag, name, call, system, messages, max_tokens)] = name
+
+            primary = next(iter(running.values()))
+            timeout = self.health[primary].hedge_after() if queue and len(running) == 1 else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:   # slower than its p95 — hedge with the next provider
+                hedge, call = queue.pop(0)
+                self.stats["hedged"] += 1
+                print(f"[router] ⏱ {primary} slower than {timeout:.1f}s — hedging with {hedge}")
+                running[self._pool.submit(self._call, tag, hedge, call, system, messages, max_tokens)] = hedge
+                continue
+
+            for future in done:
+                name     = running.pop(future)
+                text, ok = future.result()
+                last     = (name, text)
+                if ok:
+                    if name == hedge:
+                        self.stats["hedge_wins"] += 1
+                    return text, name, True
+        return last[1], last[0], False
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose HTTPS connections report how long connect() took
+    (TCP + TLS handshake) to their provider."""
+
+    def __init__(self, provider, pool_maxsize):
+        self.provider = provider   # set before super() — it builds the pool manager
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        provider = self.provider
+
+        class Connection(HTTPSConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                provider.connected(time.perf_counter() - start)
+
+        class Pool(HTTPSConnectionPool):
+            ConnectionCls = Connection
+
+        self.poolmanager.pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme, https=Pool)
+
+
+# ── LLM PROVIDER TRANSPORT ────────────────────────────────────────
+class Provider:
+    """One keep-alive requests.Session per LLM provider.
+
+    Connections are pooled (up to pool_size kept open) and reused across
+    chat turns, so only the first request — or the first after the provider
+    closes an idle socket — pays for TCP + TLS setup. Connect and read
+    timeouts are separate: a dead host fails within connect_timeout while a
+    long completion still gets read_timeout. stats() reports how many
+    connections were opened and what they cost.
+    """
+
+    def __init__(self, name, url, pool_size=8, connect_timeout=5.0, read_timeout=30.0):
+        self.name      = name
+        self.url       = url
+        self.pool_size = pool_size
+        self.timeout   = (connect_timeout, read_timeout)
+        self.session   = requests.Session()
+        self.session.mount("https://", TimedAdapter(self, pool_size))
+        self._lock     = threading.Lock()
+        self._stats    = {"requests": 0, "connections": 0, "connect_ms": 0.0}
+
+    def post(self, headers, json, stream=False):
+        with self._lock:
+            self._stats["requests"] += 1
+        return self.session.post(self.url, headers=headers, json=json, stream=stream, timeout=self.timeout)
+
+    def connected(self, seconds):
+        with self._lock:
+            self._stats["connections"] += 1
+            self._stats["connect_ms"]  += seconds * 1000
+
+    def warm(self):
+        """Open a pooled connection ahead of the first chat turn."""
+        try:
+            self.session.head(self.url, timeout=self.timeout).close()
+        except requests.RequestException as e:
+            print(f"[llm] Could not pre-connect to {self.name}: {e}")
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        conns = s["connections"]
+        return {
+            "requests":         s["requests"],
+            "connections":      conns,
+            "reused":           max(s["requests"] - conns, 0),
+            "avg_connect_ms":   round(s["connect_ms"] / conns, 1) if conns else None,
+            "total_connect_ms": round(s["connect_ms"], 1),
+            "pool_size":        self.pool_size,
+            "connect_timeout":  self.timeout[0],
+            "read_timeout":     self.timeout[1],
+        }
@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance as yf
+
+from bar_store import bars
+from shared_cache import RevalidatingCache
+from yahoo_async import yahoo
+
+PRICE_TTL        = int(os.getenv("PRICE_TTL", 60))              # seconds a price snapshot is fresh
+PRICE_STALE      = int(os.getenv("PRICE_STALE", 300))           # ...and how much longer it may be served stale
+PRICE_BAR_AGE    = 5                                             # a price refresh reuses bars synced this recently
+FUNDAMENTALS_TTL = int(os.getenv("FUNDAMENTALS_TTL", 6 * 3600))  # refreshed in the background after this
+FUNDAMENTALS_MAX = FUNDAMENTALS_TTL * 4                          # dropped outright after this
+
+# The .info fields either service reads — the full payload is ~150 keys
+FUNDAMENTAL_FIELDS = [
+    "longName", "shortName", "sector", "industry", "marketCap", "trailingPE",
+    "forwardPE", "trailingEps", "totalRevenue", "profitMargins", "grossMargins",
+    "debtToEquity", "returnOnEquity", "beta", "fiftyTwoWeekHigh", "fiftyTwoWeekLow",
+    "averageVolume", "dividendYield", "targetMeanPrice", "recommendationKey",
+    "longBusinessSummary", "earningsDate",
+]
+
+
+def pick(info):
+    return {k: info[k] for k in FUNDAMENTAL_FIELDS if info.get(k) is not None}
+
+
+def snapshot(hist):
+    """Price fields from the last two bars of an OHLCV frame."""
+    price      = float(hist["Close"].iloc[-1])
+    prev_close = float(hist["Close"].iloc[-2]) if len(hist) >= 2 else price
+    change     = price - prev_close
+    return {
+        "price":      price,
+        "prev_close": prev_close,
+        "change":     change,
+        "pct":        (change / prev_close * 100) if prev_close else 0,
+    }
+
+
+# ── TWO-TIER MARKET DATA ──────────────────────────────────────────
+class MarketData:
+    """Prices and fundamentals cached on separate clocks.
+
+    Prices (price:<SYM>) come from the bar store and are fresh for PRICE_TTL
+    seconds. Fundamentals (info:<SYM>, earnings:<SYM>) are the slow,
+    rate-limited Ticker.info / earnings_dates calls and are fresh for
+    FUNDAMENTALS_TTL. Both tiers go through RevalidatingCache, so past
+    their TTL the cached copy is served while a background refresh runs,
+    and concurrent misses share one upstream call. Callers merge the two
+    tiers when they build a response.
+    """
+
+    def __init__(self, cache, workers=4):
+        self.lookups = RevalidatingCache(cache, workers=workers)
+
+    def prices(self, symbols):
+        """{symbol: {price, prev_close, change, pct}} for symbols with data.
+
+        Misses are read through bars.get_many, which downloads every stale
+        symbol in multi-ticker batches of DOWNLOAD_BATCH — N symbols cost
+        about N / DOWNLOAD_BATCH upstream requests instead of N. The store is
+        asked to sync unless it did so in the last PRICE_BAR_AGE seconds, so
+        an entry's fetched_at is also roughly the age of its bars.
+        """
+        found = self.lookups.get_many("price", symbols, self._fetch_prices, PRICE_TTL, PRICE_STALE,
+                                      batch=True)
+        return {s: p for s, p in found.items() if p}
+
+    def fundamentals(self, symbols):
+        """{symbol: dict of FUNDAMENTAL_FIELDS}; {} where Yahoo has nothing."""
+        return self.lookups.get_many("info", symbols, self._fetch_infos, FUNDAMENTALS_TTL,
+                                     FUNDAMENTALS_MAX - FUNDAMENTALS_TTL, default={}, batch=True)
+
+    def next_earnings(self, symbol):
+        # quoteSummary's calendarEvents usually has it already
+        known = self.fundamentals([symbol])[symbol].get("earningsDate")
+        if known:
+            return known
+        return self.lookups.get("earnings", symbol, self._fetch_earnings, FUNDAMENTALS_TTL,
+                                FUNDAMENTALS_MAX - FUNDAMENTALS_TTL, default="N/A")
+
+    def warm_prices(self, symbols, lead):
+        """Refresh prices due within `lead` seconds; (fetched, worst lag)."""
+        return self.lookups.refresh("price", symbols, self._fetch_prices, PRICE_TTL, PRICE_STALE,
+                                    lead=lead, batch=True)
+
+    def warm_fundamentals(self, symbols, lead, limit=None):
+        return self.lookups.refresh("info", symbols, self._fetch_infos, FUNDAMENTALS_TTL,
+                                    FUNDAMENTALS_MAX - FUNDAMENTALS_TTL, lead=lead, batch=True, limit=limit)
+
+    @staticmethod
+    def _fetch_prices(symbols):
+        try:
+            frames = bars.get_many(symbols, period="2d", max_age=PRICE_BAR_AGE)
+        except Exception as e:
+            print(f"  [!] Error fetching {', '.join(symbols)}: {e}")
+            return {}
+        return {s: snapshot(hist) for s, hist in frames.items() if not hist.empty}
+
+    def _fetch_infos(self, symbols):
+        """All symbols in one asyncio round on the pooled Yahoo client;
+        anything it could not get is retried through yfinance."""
+        try:
+            found = yahoo.info_many(symbols)
+        except Exception as e:
+            print(f"  [!] Async fundamentals failed ({type(e).__name__}) — falling back to yfinance")
+            found = {}
+        out    = {s: pick(info) for s, info in found.items() if info is not None}
+        failed = [s for s in symbols if s not in out]
+        if failed:
+            with ThreadPoolExecutor(max_workers=min(len(failed), 8)) as pool:
+                out.update(zip(failed, pool.map(self._fetch_info, failed)))
+        return out
+
+    @staticmethod
+    def _fetch_info(symbol):
+        try:
+            info = yf.Ticker(symbol).info or {}
+        except Exception as e:
+            print(f"  [!] Fundamentals failed for {symbol}: {e}")
+            return None
+        return pick(info)
+
+    @staticmethod
+    def _fetch_earnings(symbol):
+        try:
+            earnings = yf.Ticker(symbol).earnings_dates
+            return str(earnings.index[0].date()) if earnings is not None and not earnings.empty else "N/A"
+        except Exception as e:
+            print(f"  [!] Earnings dates failed for {symbol}: {e}")
+            return None
@@ -0,0 +1,163 @@
+import os
+import socket
+import threading
+import time
+
+from bar_store import DOWNLOAD_BATCH
+
+PREFETCH_INTERVAL = int(os.getenv("PREFETCH_INTERVAL", 15))       # seconds between scheduler ticks
+PREFETCH_BUDGET   = int(os.getenv("PREFETCH_BUDGET", 30))         # upstream requests per minute
+WATCH_WINDOW      = int(os.getenv("PREFETCH_WATCH_WINDOW", 3600))  # forget symbols unrequested this long
+MAX_TRACKED       = 200
+HISTORY_EVERY     = 300                                            # seconds between history syncs
+HISTORY_PERIODS   = [("1y", "1d"), ("7d", "1h")]                   # what /api/history reads
+LEASE             = PREFETCH_INTERVAL * 3
+
+
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ── BACKGROUND PREFETCHER ─────────────────────────────────────────
+class Prefetcher:
+    """Keeps quotes and history warm for the default and recently used symbols.
+
+    Routes call note(symbols); each worker merges what it saw into a shared
+    prefetch:watch entry, so the watchlist is learned from every worker's
+    requests. One worker at a time holds the prefetch:leader lease (taken
+    with cache.add) and, every PREFETCH_INTERVAL seconds, refreshes prices
+    and fundamentals that would go stale before the next tick, plus the
+    /api/history bars every HISTORY_EVERY seconds. Upstream requests are
+    drawn from a token bucket of PREFETCH_BUDGET per minute; work that does
+    not fit waits for the next tick.
+    """
+
+    def __init__(self, cache, market, store, defaults):
+        self.cache      = cache
+        self.market     = market
+        self.store      = store
+        self.defaults   = list(defaults)
+        self.identity   = f"{socket.gethostname()}:{os.getpid()}"
+        self._seen      = {}     # symbol -> last request time, not yet published
+        self._lock      = threading.Lock()
+        self._tokens    = float(PREFETCH_BUDGET)
+        self._refill_at = time.time()
+        self._history   = 0.0    # when the history bars were last synced
+        self.metrics    = {
+            "leader":               False,
+            "ticks":                0,
+            "lastTickAt":           None,
+            "tracked":              0,
+            "upstreamCalls":        0,
+            "budgetPerMinute":      PREFETCH_BUDGET,
+            "skippedForBudget":     0,
+            "refreshLagSeconds":    0.0,   # worst time past TTL at the last tick; 0 = refreshed in time
+            "maxRefreshLagSeconds": 0.0,
+        }
+
+    def note(self, symbols):
+        now = time.time()
+        with self._lock:
+            for s in symbols:
+                self._seen[s] = now
+
+    def start(self):
+        threading.Thread(target=self._loop, daemon=True, name="prefetch").start()
+        print(f"[prefetch] Scheduler started — every {PREFETCH_INTERVAL}s, {PREFETCH_BUDGET} upstream calls/min")
+
+    def _loop(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[prefetch] Tick failed: {e}")
+            time.sleep(PREFETCH_INTERVAL)
+
+    # ── one pass ──────────────────────────────────────────────────
+    def tick(self):
+        self._publish()
+        self.metrics["leader"] = self._lead()
+        if not self.metrics["leader"]:
+            return
+        symbols = self._watchlist()
+        lead    = PREFETCH_INTERVAL * 1.5
+        self._refill()
+
+        lag = 0.0
+        for chunk in chunks(symbols, DOWNLOAD_BATCH):
+            ran, result = self._spend(lambda: self.market.warm_prices(chunk, lead))
+            if not ran:
+                break
+            lag = max(lag, result[1])
+
+        if self._tokens >= 1:
+            fetched, _ = self.market.warm_fundamentals(symbols, lead, limit=int(self._tokens))
+            self._charge(fetched)
+
+        if time.time() - self._history >= HISTORY_EVERY:
+            done = True
+            for period, interval in HISTORY_PERIODS:
+                for chunk in chunks(symbols, DOWNLOAD_BATCH):
+                    ran, _ = self._spend(lambda: self.store.sync(chunk, period, interval))
+                    done &= ran
+            if done:
+                self._history = time.time()
+
+        self.metrics.update(ticks=self.metrics["ticks"] + 1, lastTickAt=time.time(),
+                            tracked=len(symbols), refreshLagSeconds=round(lag, 1),
+                            maxRefreshLagSeconds=round(max(lag, self.metrics["maxRefreshLagSeconds"]), 1))
+
+    def _spend(self, work):
+        """(ran, result) — run work if a token is left, charging the bar
+        store requests it really made."""
+        if self._tokens < 1:
+            self.metrics["skippedForBudget"] += 1
+            return False, None
+        before = self.store.stats["upstream_calls"]
+        result = work()
+        self._charge(self.store.stats["upstream_calls"] - before)
+        return True, result
+
+    def _charge(self, calls):
+        self._tokens -= calls
+        self.metrics["upstreamCalls"] += calls
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(PREFETCH_BUDGET, self._tokens + (now - self._refill_at) * PREFETCH_BUDGET / 60)
+        self._refill_at = now
+
+    # ── shared state ──────────────────────────────────────────────
+    def _lead(self):
+        if self.cache.add("prefetch:leader", self.identity, timeout=LEASE):
+            return True
+        if self.cache.get("prefetch:leader") == self.identity:
+            self.cache.set("prefetch:leader", self.identity, timeout=LEASE)
+            return True
+        return False
+
+    def _publish(self):
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen:
+            return
+        if not self.cache.add("lock:prefetch:watch", self.identity, timeout=5):
+            with self._lock:   # someone else is merging — try again next tick
+                for s, t in seen.items():
+                    self._seen[s] = max(t, self._seen.get(s, 0))
+            return
+        try:
+            now   = time.time()
+            watch = self.cache.get("prefetch:watch") or {}
+            for s, t in seen.items():
+                watch[s] = max(t, watch.get(s, 0))
+            recent = sorted((t, s) for s, t in watch.items() if now - t < WATCH_WINDOW)[-MAX_TRACKED:]
+            self.cache.set("prefetch:watch", {s: t for t, s in recent}, timeout=WATCH_WINDOW)
+        finally:
+            self.cache.delete("lock:prefetch:watch")
+
+    def _watchlist(self):
+        watch  = self.cache.get("prefetch:watch") or {}
+        recent = sorted(watch, key=watch.get, reverse=True)
+        return list(dict.fromkeys(self.defaults + recent))[:MAX_TRACKED]
+
@@ -0,0 +1,140 @@
+import json
+import os
+import queue
+import threading
+import time
+
+STREAM_INTERVAL  = int(os.getenv("STREAM_INTERVAL", 5))   # seconds between shared polls
+STREAM_HEARTBEAT = 15                                      # idle seconds before a keep-alive comment
+STREAM_MAX       = int(os.getenv("STREAM_MAX", 16))        # open streams per worker; each holds a thread
+QUEUE_SIZE       = 50
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    def __init__(self, symbols):
+        self.symbols = set(symbols)
+        self.queue   = queue.Queue(maxsize=QUEUE_SIZE)
+
+
+# ── QUOTE FAN-OUT ─────────────────────────────────────────────────
+class QuoteHub:
+    """One poller per process feeding every /api/stream client.
+
+    Every STREAM_INTERVAL seconds the hub fetches the union of all
+    subscribed symbols once through `fetch(symbols) -> [quote]` (the cached
+    get_quotes path), diffs each quote against the last one it saw and
+    queues only the changed fields to the subscribers of that symbol.
+    Upstream cost therefore follows the number of distinct symbols, not the
+    number of open clients. A client too slow to drain its queue is sent a
+    fresh snapshot instead of the backlog.
+
+    Every open stream holds a worker thread, so at most max_subscribers are
+    accepted; subscribe() returns None beyond that and the client polls.
+    """
+
+    def __init__(self, fetch, interval=STREAM_INTERVAL, max_subscribers=STREAM_MAX):
+        self.fetch           = fetch
+        self.interval        = interval
+        self.max_subscribers = max_subscribers
+        self._subs           = set()
+        self._last           = {}     # symbol -> last quote seen
+        self._lock           = threading.Lock()
+        self._thread         = None
+        self.stats           = {"subscribers": 0, "rejected": 0, "polls": 0, "deltas": 0, "resyncs": 0}
+
+    def subscribe(self, symbols):
+        """A new Subscription, or None when max_subscribers streams are open."""
+        sub = Subscription(symbols)
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                self.stats["rejected"] += 1
+                return None
+            self._subs.add(sub)
+            self.stats["subscribers"] = len(self._subs)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="quote-stream")
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+            self.stats["subscribers"] = len(self._subs)
+
+    def snapshot(self, symbols):
+        """Current quotes for symbols, fetching any the hub has not seen yet."""
+        with self._lock:
+            missing = [s for s in symbols if s not in self._last]
+        if missing:
+            for q in self.fetch(missing):
+                with self._lock:
+                    self._last.setdefault(q["symbol"], q)
+        with self._lock:
+            return [self._last[s] for s in symbols if s in self._last]
+
+    def events(self, sub):
+        """SSE stream for one subscription: a snapshot, then deltas."""
+        try:
+            yield "retry: 5000\n\n"
+            yield sse("snapshot", self.snapshot(sorted(sub.symbols)))
+            while True:
+                try:
+                    event, data = sub.queue.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse(event, data)
+        finally:
+            self.unsubscribe(sub)
+
+    # ── shared poller ─────────────────────────────────────────────
+    def _loop(self):
+        while True:
+            started = time.time()
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"[stream] Poll failed: {e}")
+            time.sleep(max(0.0, self.interval - (time.time() - started)))
+
+    def _poll(self):
+        with self._lock:
+            subs    = list(self._subs)
+            symbols = sorted(set().union(*(s.symbols for s in subs))) if subs else []
+        if not symbols:
+            return
+        self.stats["polls"] += 1
+        changes = {}
+        for q in self.fetch(symbols):
+            with self._lock:
+                old = self._last.get(q["symbol"], {})
+                self._last[q["symbol"]] = q
+            diff = {k: v for k, v in q.items() if old.get(k) != v}
+            if diff:
+                changes[q["symbol"]] = diff
+        if not changes:
+            return
+        for sub in subs:
+            mine = {s: d for s, d in changes.items() if s in sub.symbols}
+            if mine:
+                self._send(sub, mine)
+
+    def _send(self, sub, delta):
+        try:
+            sub.queue.put_nowait(("delta", delta))
+            self.stats["deltas"] += 1
+        except queue.Full:
+            # Drop the backlog; one snapshot brings the client level again
+            while not sub.queue.empty():
+                try:
+                    sub.queue.get_nowait()
+                except queue.Empty:
+                    break
+            with self._lock:
+                current = [self._last[s] for s in sorted(sub.symbols) if s in self._last]
+            sub.queue.put_nowait(("snapshot", current))
+            self.stats["resyncs"] += 1
@@ -1,8 +1,10 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_caching import Cache
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import reduce
 from pathlib import Path
+import numpy as np
+import pandas as pd
 import yfinance as yf
 import threading
 import time
@@ -10,6 +12,11 @@ import requests as req
 import os
 import warnings
 from dotenv import load_dotenv
+from bar_store import bars
+from shared_cache import cache_config
+from market_data import MarketData
+from prefetch import Prefetcher
+from quote_stream import QuoteHub
 
 load_dotenv(Path(__file__).parent.parent / ".env")
 warnings.filterwarnings("ignore")
@@ -17,10 +24,9 @@ warnings.filterwarnings("ignore")
 app = Flask(__name__)
 CORS(app, origins=["*"])
 
-cache = Cache(app, config={
-    "CACHE_TYPE": "SimpleCache",
-    "CACHE_DEFAULT_TIMEOUT": 300
-})
+# Shared across gunicorn workers (SQLite file, or Redis via CACHE_URL)
+cache = Cache(app, config=cache_config(default_timeout=300))
+market = MarketData(cache, workers=10)
 
 DEFAULT_SYMBOLS = [
     "NVDA", "AAPL", "TSLA", "AMZN", "MSFT", "META",
@@ -48,6 +54,11 @@ def keep_alive():
 pinger_thread = threading.Thread(target=keep_alive, daemon=True)
 pinger_thread.start()
 
+# Keep default and recently requested symbols warm ahead of their TTL
+prefetcher = Prefetcher(cache, market, bars, DEFAULT_SYMBOLS)
+if os.getenv("PREFETCH", "1") == "1":
+    prefetcher.start()
+
 # ── Helpers ───────────────────────────────────────────────────────
 def format_large(n):
     if n is None: return "N/A"
@@ -62,66 +73,89 @@ def safe_round(val, digits=2):
     try: return round(float(val), digits)
     except: return "N/A"
 
-def fetch_one(symbol):
-    try:
-        ticker = yf.Ticker(symbol)
-        info   = ticker.info
-        hist   = ticker.history(period="2d")
-        if hist.empty: return None
-        current    = float(hist["Close"].iloc[-1])
-        prev_close = float(hist["Close"].iloc[-2]) if len(hist) >= 2 else current
-        change     = current - prev_close
-        pct        = (change / prev_close * 100) if prev_close else 0
-        return {
-            "symbol": symbol,
-            "name":   info.get("longName") or info.get("shortName", symbol),
-            "price":  safe_round(current),
-            "change": safe_round(change),
-            "pct":    safe_round(pct),
-            "sector": info.get("sector") or info.get("industry", "—"),
-            "mktCap": format_large(info.get("marketCap")),
-            "pe":     safe_round(info.get("trailingPE")) if info.get("trailingPE") else "N/A",
-            "vol":    format_large(info.get("averageVolume")),
-        }
-    except Exception as e:
-        print(f"  [!] Error fetching {symbol}: {e}")
-        return None
+MONTHS = np.array(["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                   "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])
+
+def _cat(*parts):
+    return reduce(np.char.add, parts)
+
+def history_json(ts, tz, close, volume, intraday=False):
+    """Serialise a history slice to the /api/history JSON with whole-array
+    string ops — no Python work per row."""
+    local = pd.DatetimeIndex(ts, tz="UTC").tz_convert(tz)
+    two   = lambda a: np.char.zfill(a.to_numpy().astype(str), 2)
+    date  = _cat(MONTHS[local.month.to_numpy() - 1], " ", two(local.day))
+    if intraday:
+        date = _cat(date, " ", two(local.hour), ":", two(local.minute))
+    price  = np.where(np.isnan(close), '"N/A"', np.round(close, 2).astype(str))
+    volume = np.nan_to_num(volume).astype(np.int64).astype(str)
+    rows   = _cat('{"date":"', date, '","price":', price, ',"volume":', volume, "}")
+    return "[" + ",".join(rows.tolist()) + "]"
+
+def format_quote(symbol, price, info):
+    """Merge the price tier and the fundamentals tier into one /api/stocks row."""
+    return {
+        "symbol": symbol,
+        "name":   info.get("longName") or info.get("shortName", symbol),
+        "price":  safe_round(price["price"]),
+        "change": safe_round(price["change"]),
+        "pct":    safe_round(price["pct"]),
+        "sector": info.get("sector") or info.get("industry", "—"),
+        "mktCap": format_large(info.get("marketCap")),
+        "pe":     safe_round(info.get("trailingPE")) if info.get("trailingPE") else "N/A",
+        "vol":    format_large(info.get("averageVolume")),
+    }
+
+def get_quotes(symbols):
+    """Quotes for symbols: prices on a short TTL, fundamentals on a long one
+    with background refresh, merged per request."""
+    prices = market.prices(symbols)
+    infos  = market.fundamentals([s for s in symbols if s in prices])
+    return [format_quote(s, prices[s], infos[s]) for s in symbols if s in prices]
+
+# One shared poller fans quote changes out to every /api/stream client
+hub = QuoteHub(get_quotes)
+MAX_STREAM_SYMBOLS = 100
 
 # ── Routes ────────────────────────────────────────────────────────
 @app.route("/api/stocks")
-@cache.cached(timeout=300, query_string=True)
 def get_stocks():
     symbols = request.args.get("symbols", ",".join(DEFAULT_SYMBOLS)).split(",")
-    symbols = [s.strip().upper() for s in symbols if s.strip()]
-    print(f"[stocks] Fetching {len(symbols)} symbols in parallel...")
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_one, s): s for s in symbols}
-        for future in as_completed(futures):
-            result = future.result()
-            if result: results.append(result)
-    order = {s: i for i, s in enumerate(symbols)}
-    results.sort(key=lambda x: order.get(x["symbol"], 99))
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    prefetcher.note(symbols)
+    results = get_quotes(symbols)
     print(f"[stocks] Done — {len(results)} stocks returned")
     return jsonify(results)
 
+@app.route("/api/stream")
+def stream_quotes():
+    """Server-Sent Events feed: a "snapshot" event with the full quotes, then
+    "delta" events holding only the fields that changed, keyed by symbol."""
+    symbols = request.args.get("symbols", ",".join(DEFAULT_SYMBOLS)).split(",")
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))[:MAX_STREAM_SYMBOLS]
+    prefetcher.note(symbols)
+    sub = hub.subscribe(symbols)
+    if sub is None:
+        # Every stream slot is taken — keep threads free for the REST routes; clients poll /api/stocks
+        return jsonify({"error": "Too many open streams, poll /api/stocks instead"}), 503, {"Retry-After": "60"}
+    return Response(hub.events(sub), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/api/history/<symbol>")
 @cache.cached(timeout=600, query_string=True)
 def get_history(symbol):
     symbol = symbol.upper()
+    prefetcher.note([symbol])
     days   = int(request.args.get("days", 90))
     if days <= 7:    period, interval = "7d",  "1h"
     elif days <= 30: period, interval = "1mo", "1d"
     elif days <= 90: period, interval = "3mo", "1d"
     else:            period, interval = "1y",  "1d"
     try:
-        hist = yf.Ticker(symbol).history(period=period, interval=interval)
-        if hist.empty: return jsonify({"error": f"No data for {symbol}"}), 404
-        data = []
-        for ts, row in hist.iterrows():
-            fmt = "%b %d" if interval == "1d" else "%b %d %H:%M"
-            data.append({ "date": ts.strftime(fmt), "price": safe_round(row["Close"]), "volume": int(row["Volume"]) })
-        return jsonify(data)
+        ts, cols, tz = bars.arrays(symbol, period=period, interval=interval, columns=["Close", "Volume"])
+        if not len(ts): return jsonify({"error": f"No data for {symbol}"}), 404
+        body = history_json(ts, tz, cols["Close"], cols["Volume"], intraday=interval != "1d")
+        return Response(body, mimetype="application/json")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -141,7 +175,11 @@ def search():
 
 @app.route("/api/health")
 def health():
-    return jsonify({"status": "ok", "server": "QuantDesk API", "port": 5000})
+    stats = getattr(cache.cache, "stats", None)
+    return jsonify({"status": "ok", "server": "QuantDesk API", "port": 5000,
+                    "cache": stats() if stats else type(cache.cache).__name__,
+                    "prefetch": prefetcher.metrics,
+                    "stream":   hub.stats})
 
 @app.route("/api/cache/clear", methods=["POST"])
 def clear_cache():
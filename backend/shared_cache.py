@@ -0,0 +1,414 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from flask_caching.backends.base import BaseCache
+
+CACHE_URL    = os.getenv("CACHE_URL", "")   # redis://host:6379/0, or a path to the shared SQLite file
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 64))
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "cache.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key      TEXT PRIMARY KEY,
+    value    BLOB NOT NULL,
+    size     INTEGER NOT NULL,
+    expires  REAL NOT NULL,          -- 0 = never
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_expires  ON entries (expires);
+CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_ins AFTER INSERT ON entries
+    BEGIN UPDATE usage SET bytes = bytes + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_del AFTER DELETE ON entries
+    BEGIN UPDATE usage SET bytes = bytes - OLD.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_upd AFTER UPDATE OF size ON entries
+    BEGIN UPDATE usage SET bytes = bytes - OLD.size + NEW.size; END;
+"""
+
+
+def cache_config(default_timeout=300):
+    """flask_caching config for the cache shared by every worker and service.
+
+    CACHE_URL=redis://... uses Redis (needs the `redis` package); anything
+    else is the path of a SQLite file used by SqliteCache (default
+    data/cache.sqlite next to the bar store).
+    """
+    if CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return {
+            "CACHE_TYPE":            "RedisCache",
+            "CACHE_REDIS_URL":       CACHE_URL,
+            "CACHE_KEY_PREFIX":      "quantdesk:",
+            "CACHE_DEFAULT_TIMEOUT": default_timeout,
+        }
+    return {
+        "CACHE_TYPE":            "shared_cache.SqliteCache",
+        "CACHE_SQLITE_PATH":     CACHE_URL or str(DEFAULT_PATH),
+        "CACHE_MAX_BYTES":       CACHE_MAX_MB * 2**20,
+        "CACHE_DEFAULT_TIMEOUT": default_timeout,
+    }
+
+
+def open_cache(default_timeout=300):
+    """The same shared backend, for code that runs without flask_caching."""
+    config = cache_config(default_timeout)
+    if config["CACHE_TYPE"] == "RedisCache":
+        import redis
+        from flask_caching.backends import RedisCache
+        return RedisCache(redis.from_url(CACHE_URL), key_prefix=config["CACHE_KEY_PREFIX"],
+                          default_timeout=default_timeout)
+    return SqliteCache(config["CACHE_SQLITE_PATH"], config["CACHE_MAX_BYTES"], default_timeout)
+
+
+# ── SHARED SQLITE CACHE ───────────────────────────────────────────
+class SqliteCache(BaseCache):
+    """flask_caching backend in one SQLite file shared across processes.
+
+    Every gunicorn worker (and the agent service) sees the same entries, so
+    a value fetched once is a hit everywhere and clear() is global. Each row
+    records its pickled size; triggers keep the running total, and when it
+    passes max_bytes the least recently read entries are evicted. Reads only
+    re-stamp `accessed` once per ACCESS_RESOLUTION seconds to keep hits
+    cheap.
+    """
+
+    ACCESS_RESOLUTION = 5.0
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=64 * 2**20, default_timeout=300, **kwargs):
+        super().__init__(default_timeout=default_timeout, **kwargs)
+        self.path      = str(path)
+        self.max_bytes = max_bytes
+        self.hits      = 0
+        self.misses    = 0
+        self._local    = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db.executescript(SCHEMA)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(path=config.get("CACHE_SQLITE_PATH", DEFAULT_PATH),
+                      max_bytes=config.get("CACHE_MAX_BYTES", 64 * 2**20))
+        return cls(*args, **kwargs)
+
+    @property
+    def _db(self):
+        # sqlite3 connections are per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA mmap_size=67108864")
+            self._local.db = db
+        return db
+
+    def _expiry(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else 0
+
+    # ── BaseCache API ─────────────────────────────────────────────
+    def get(self, key):
+        now = time.time()
+        row = self._db.execute(
+            "SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] and row[1] <= now):
+            self.misses += 1
+            return None
+        if now - row[2] > self.ACCESS_RESOLUTION:
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=None):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return False
+        self._db.execute(
+            "INSERT INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "expires = excluded.expires, accessed = excluded.accessed",
+            (key, blob, len(blob), self._expiry(timeout), time.time()))
+        self._evict()
+        return True
+
+    def add(self, key, value, timeout=None):
+        """Atomic set-if-absent across processes — usable as a lock."""
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now  = time.time()
+        cur  = self._db.execute(
+            "INSERT INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "expires = excluded.expires, accessed = excluded.accessed "
+            "WHERE entries.expires != 0 AND entries.expires <= ?",
+            (key, blob, len(blob), self._expiry(timeout), now, now))
+        return cur.rowcount == 1
+
+    def get_many(self, *keys):
+        """One query for a whole watchlist instead of one per key."""
+        if not keys:
+            return []
+        now  = time.time()
+        rows = self._db.execute(
+            f"SELECT key, value, expires, accessed FROM entries WHERE key IN ({','.join('?' * len(keys))})",
+            keys).fetchall()
+        found = {k: (v, a) for k, v, e, a in rows if not e or e > now}
+        touch = [(now, k) for k, (_, a) in found.items() if now - a > self.ACCESS_RESOLUTION]
+        if touch:
+            self._db.executemany("UPDATE entries SET accessed = ? WHERE key = ?", touch)
+        self.hits   += len(found)
+        self.misses += len(keys) - len(found)
+        return [pickle.loads(found[k][0]) if k in found else None for k in keys]
+
+    def set_many(self, mapping, timeout=None):
+        expires, now = self._expiry(timeout), time.time()
+        rows = []
+        for key, value in mapping.items():
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if len(blob) <= self.max_bytes:
+                rows.append((key, blob, len(blob), expires, now))
+        with self._db:   # one transaction
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "expires = excluded.expires, accessed = excluded.accessed", rows)
+        self._evict()
+        return [r[0] for r in rows]
+
+    def delete(self, key):
+        return self._db.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount == 1
+
+    def has(self, key):
+        row = self._db.execute("SELECT expires FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None and (not row[0] or row[0] > time.time())
+
+    def clear(self):
+        self._db.execute("DELETE FROM entries")
+        return True
+
+    # ── accounting ────────────────────────────────────────────────
+    def _evict(self):
+        used = self._db.execute("SELECT bytes FROM usage").fetchone()[0]
+        if used <= self.max_bytes:
+            return
+        self._db.execute("DELETE FROM entries WHERE expires != 0 AND expires <= ?", (time.time(),))
+        while self._db.execute("SELECT bytes FROM usage").fetchone()[0] > self.max_bytes:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed LIMIT 32)")
+
+    def stats(self):
+        entries, = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        used,    = self._db.execute("SELECT bytes FROM usage").fetchone()
+        return {"backend": "sqlite", "entries": entries, "bytes": used,
+                "maxBytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+# ── COALESCING ────────────────────────────────────────────────────
+class SingleFlight:
+    """At most one call per key in flight; concurrent callers for the same
+    key wait for it and share its result (or its exception)."""
+
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._calls = {}
+        self.shared = 0   # calls answered by someone else's fetch
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def do_many(self, keys, fn):
+        """Batch form of do(): fn(keys) is called once with the keys nobody
+        else is fetching and returns {key: result}; keys already in flight
+        are awaited instead."""
+        with self._lock:
+            mine, theirs = {}, {}
+            for key in keys:
+                if key in self._calls:
+                    theirs[key] = self._calls[key]
+                else:
+                    mine[key] = self._calls[key] = Future()
+            self.shared += len(theirs)
+        try:
+            results = dict(fn(list(mine))) if mine else {}
+            for key, future in mine.items():
+                future.set_result(results.get(key))
+        except BaseException as e:
+            for future in mine.values():
+                future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                for key in mine:
+                    del self._calls[key]
+        results.update((key, future.result()) for key, future in theirs.items())
+        return results
+
+    def running(self, key):
+        with self._lock:
+            return key in self._calls
+
+
+class RevalidatingCache:
+    """Stale-while-revalidate lookups over a shared cache backend.
+
+    Values are stored as {"data", "fetched_at"} and kept for ttl + stale_ttl
+    seconds. Younger than ttl they are returned as is; older, they are still
+    returned at once while a background thread fetches a replacement. Only
+    misses wait on upstream.
+
+    Fetches are coalesced twice: SingleFlight inside the process, and a
+    lock:<key> entry taken with cache.add() across processes. Keys another
+    process holds the lock for are waited on for up to `wait` seconds before
+    being fetched here anyway. A fetch that returns None is not stored, so
+    failures are retried rather than cached.
+    """
+
+    def __init__(self, cache, workers=4, wait=5.0, lock_timeout=30):
+        self.cache        = cache
+        self.wait         = wait
+        self.lock_timeout = lock_timeout
+        self.flight       = SingleFlight()
+        self._fetchers    = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+        self._background  = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidate")
+        self.stats        = {"fresh": 0, "stale": 0, "miss": 0, "fetches": 0, "fetched": 0, "waited": 0}
+
+    def get_many(self, prefix, names, fetch, ttl, stale_ttl, default=None, batch=False):
+        """{name: value} with every value cached under <prefix>:<name>.
+
+        fetch(name) returns one value and misses are fetched in parallel;
+        with batch=True, fetch(names) returns {name: value} for a whole list
+        in one call.
+        """
+        fetch_many = fetch if batch else self._fan_out(fetch)
+        keys    = {f"{prefix}:{n}": n for n in names}
+        entries = self.cache.get_many(*keys) if keys else []
+        now     = time.time()
+        out, missing, stale = {}, [], []
+        for (key, name), entry in zip(keys.items(), entries):
+            if entry is None:
+                missing.append(key)
+                continue
+            out[name] = entry["data"]
+            if now - entry["fetched_at"] < ttl:
+                self.stats["fresh"] += 1
+            else:
+                self.stats["stale"] += 1
+                if not self.flight.running(key):
+                    stale.append(key)
+        if stale:
+            self._background.submit(self._revalidate, stale, keys, fetch_many, ttl, stale_ttl)
+        if missing:
+            self.stats["miss"] += len(missing)
+            found = self.flight.do_many(
+                missing, lambda mine: self._fetch(mine, keys, fetch_many, ttl, stale_ttl, wait=True))
+            for key in missing:
+                out[keys[key]] = default if found.get(key) is None else found[key]
+        return {n: out[n] for n in names}
+
+    def get(self, prefix, name, fetch, ttl, stale_ttl, default=None):
+        return self.get_many(prefix, [name], fetch, ttl, stale_ttl, default)[name]
+
+    def refresh(self, prefix, names, fetch, ttl, stale_ttl, lead=0.0, batch=False, limit=None):
+        """Fetch, ahead of any reader, entries that are missing or will go
+        stale within `lead` seconds — at most `limit` of them.
+
+        Returns (number fetched, worst lag), where lag is how many seconds
+        the oldest due entry had already been past its ttl.
+        """
+        fetch_many = fetch if batch else self._fan_out(fetch)
+        keys = {f"{prefix}:{n}": n for n in names}
+        now  = time.time()
+        due, lag = [], 0.0
+        for key, entry in zip(keys, self.cache.get_many(*keys) if keys else []):
+            age = None if entry is None else now - entry["fetched_at"]
+            if (age is None or age >= ttl - lead) and not self.flight.running(key):
+                due.append(key)
+                lag = max(lag, 0.0 if age is None else age - ttl)
+        due = due[:limit]
+        if due:
+            self.flight.do_many(due, lambda mine: self._fetch(mine, keys, fetch_many, ttl, stale_ttl,
+                                                              wait=False, max_age=ttl - lead))
+        return len(due), lag
+
+    def _fan_out(self, fetch):
+        def fetch_many(names):
+            if len(names) == 1:
+                return {names[0]: fetch(names[0])}
+            return dict(zip(names, self._fetchers.map(fetch, names)))
+        return fetch_many
+
+    def _revalidate(self, keys, names, fetch_many, ttl, stale_ttl):
+        try:
+            self.flight.do_many(keys, lambda mine: self._fetch(mine, names, fetch_many, ttl, stale_ttl, wait=False))
+        except Exception as e:
+            print(f"[cache] Background refresh of {len(keys)} keys failed: {e}")
+
+    def _fetch(self, keys, names, fetch_many, ttl, stale_ttl, wait, max_age=None):
+        """{key: value} for keys, taking the cross-process lock on each."""
+        locked = [k for k in keys if self.cache.add(f"lock:{k}", os.getpid(), timeout=self.lock_timeout)]
+        held   = [k for k in keys if k not in set(locked)]   # another process is on these
+        try:
+            out = self._fetch_unlocked(locked, names, fetch_many, ttl, stale_ttl, max_age)
+        finally:
+            if locked:
+                self.cache.delete_many(*[f"lock:{k}" for k in locked])
+        if not held or not wait:
+            return out
+        deadline = time.time() + self.wait
+        while held and time.time() < deadline:
+            time.sleep(0.05)
+            for key, entry in zip(list(held), self.cache.get_many(*held)):
+                if entry is not None:
+                    out[key] = entry["data"]
+                    held.remove(key)
+                    self.stats["waited"] += 1
+        out.update(self._fetch_unlocked(held, names, fetch_many, ttl, stale_ttl))
+        return out
+
+    def _fetch_unlocked(self, keys, names, fetch_many, ttl, stale_ttl, max_age=None):
+        if not keys:
+            return {}
+        # A fetch that finished just before we took the lock is good enough
+        now = time.time()
+        max_age = ttl if max_age is None else max_age
+        out = {k: e["data"] for k, e in zip(keys, self.cache.get_many(*keys))
+               if e is not None and now - e["fetched_at"] < max_age}
+        need = [k for k in keys if k not in out]
+        if not need:
+            return out
+        self.stats["fetches"] += 1
+        fetched = fetch_many([names[k] for k in need])
+        fresh   = {k: fetched.get(names[k]) for k in need}
+        fresh   = {k: v for k, v in fresh.items() if v is not None}
+        if fresh:
+            stamp = time.time()
+            self.cache.set_many({k: {"data": v, "fetched_at": stamp} for k, v in fresh.items()},
+                                timeout=ttl + stale_ttl)
+            self.stats["fetched"] += len(fresh)
+        out.update(fresh)
+        return out
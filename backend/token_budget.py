@@ -0,0 +1,78 @@
+import os
+import threading
+
+PROMPT_TOKEN_BUDGET    = int(os.getenv("PROMPT_TOKEN_BUDGET", 3000))     # system + history + question
+HISTORY_MESSAGE_TOKENS = int(os.getenv("HISTORY_MESSAGE_TOKENS", 400))   # cap on any one earlier message
+CHARS_PER_TOKEN        = 4                                               # rough for English prose and tables
+SUMMARY_CHARS          = 100                                             # per dropped message in the summary
+
+
+def estimate(text):
+    """Local token estimate — no tokenizer, ~4 characters per token."""
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def estimate_messages(messages):
+    return sum(estimate(m["content"]) + 4 for m in messages)   # + role / framing overhead
+
+
+def clip(text, tokens):
+    limit = tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+def fit_history(history, budget):
+    """(kept, dropped): the newest messages, each clipped to
+    HISTORY_MESSAGE_TOKENS, that fit in budget tokens; older ones are dropped."""
+    kept, used = [], 0
+    for i in range(len(history) - 1, -1, -1):
+        m    = dict(history[i], content=clip(history[i]["content"], HISTORY_MESSAGE_TOKENS))
+        cost = estimate_messages([m])
+        if used + cost > budget:
+            return kept, history[:i + 1]
+        kept.insert(0, m)
+        used += cost
+    return kept, []
+
+
+def summarize(dropped):
+    """One line per dropped message — a cheap stand-in for the full turns."""
+    lines = []
+    for m in dropped:
+        text = " ".join(m["content"].split())
+        lines.append(f"- {m['role']}: {text[:SUMMARY_CHARS]}{'…' if len(text) > SUMMARY_CHARS else ''}")
+    return "EARLIER IN THIS CONVERSATION (summarised):\n" + "\n".join(lines)
+
+
+# ── TOKEN ACCOUNTING ──────────────────────────────────────────────
+class TokenMeter:
+    """Input / output tokens per route and engine.
+
+    Counts come from the providers' usage fields; where a response carries
+    none (an aborted stream, an error) the local estimate is used and the
+    request is counted under "estimated".
+    """
+
+    def __init__(self):
+        self._lock   = threading.Lock()
+        self._routes = {}
+        self.prompts = {"compacted": 0, "history_trimmed": 0, "messages_dropped": 0}
+
+    def record(self, route, engine, input_tokens, output_tokens, estimated=False):
+        with self._lock:
+            row = self._routes.setdefault(route, {}).setdefault(
+                engine, {"requests": 0, "input_tokens": 0, "output_tokens": 0, "estimated": 0})
+            row["requests"]      += 1
+            row["input_tokens"]  += input_tokens or 0
+            row["output_tokens"] += output_tokens or 0
+            row["estimated"]     += bool(estimated)
+
+    def report(self):
+        with self._lock:
+            routes = {r: {e: dict(row) for e, row in engines.items()} for r, engines in self._routes.items()}
+        totals = {"input_tokens": 0, "output_tokens": 0}
+        for engines in routes.values():
+            for row in engines.values():
+                totals["input_tokens"]  += row["input_tokens"]
+                totals["output_tokens"] += row["output_tokens"]
+        return {"routes": routes, "totals": totals, "prompts": dict(self.prompts)}
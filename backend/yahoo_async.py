@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+
+import aiohttp
+
+YAHOO_CONCURRENCY     = int(os.getenv("YAHOO_CONCURRENCY", 32))      # requests in flight at once
+YAHOO_POOL_PER_HOST   = int(os.getenv("YAHOO_POOL_PER_HOST", 16))    # kept-alive connections per host
+YAHOO_CONNECT_TIMEOUT = float(os.getenv("YAHOO_CONNECT_TIMEOUT", 3))
+YAHOO_READ_TIMEOUT    = float(os.getenv("YAHOO_READ_TIMEOUT", 10))
+
+SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/{symbol}"
+CRUMB_URL   = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+COOKIE_URL  = "https://fc.yahoo.com"
+MODULES     = "price,summaryProfile,summaryDetail,defaultKeyStatistics,financialData,calendarEvents"
+HEADERS     = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                             "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"}
+
+
+def flatten(modules):
+    """Merge quoteSummary modules into one flat dict, {"raw": x, "fmt": ...} -> x,
+    the way yfinance builds Ticker.info."""
+    out = {}
+    for name, module in modules.items():
+        if not isinstance(module, dict):
+            continue
+        for key, value in module.items():
+            if isinstance(value, dict) and "raw" in value:
+                value = value["raw"]
+            elif isinstance(value, dict) and not value:
+                value = None
+            out.setdefault(key, value)
+    return out
+
+
+# ── ASYNC YAHOO CLIENT ────────────────────────────────────────────
+class YahooClient:
+    """asyncio client for Yahoo's quoteSummary endpoint.
+
+    Runs its own event loop on a daemon thread, so Flask routes (and the
+    cache's worker threads) call it synchronously through info_many(); a
+    whole watchlist is one asyncio.gather on a single pooled aiohttp
+    session — a semaphore caps requests in flight at YAHOO_CONCURRENCY and
+    the connector keeps YAHOO_POOL_PER_HOST connections alive per host.
+    Yahoo wants a cookie and crumb; both are fetched once and renewed on a
+    401.
+    """
+
+    def __init__(self):
+        self._loop    = asyncio.new_event_loop()
+        self._session = None
+        self._crumb   = None
+        self._sem     = None
+        self._renew   = None
+        threading.Thread(target=self._loop.run_forever, daemon=True, name="yahoo-async").start()
+
+    # ── sync bridge ───────────────────────────────────────────────
+    def run(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def info_many(self, symbols):
+        """{symbol: flat info dict, or None where the fetch failed}."""
+        budget = YAHOO_CONNECT_TIMEOUT + YAHOO_READ_TIMEOUT * 2 + 5
+        return self.run(self._info_many(symbols), timeout=budget)
+
+    # ── coroutines ────────────────────────────────────────────────
+    async def _info_many(self, symbols):
+        session = await self._ready()   # fails fast, once, if Yahoo is unreachable
+        results = await asyncio.gather(*(self._info(session, s) for s in symbols), return_exceptions=True)
+        out = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                print(f"  [!] Fundamentals failed for {symbol}: {type(result).__name__} {result}")
+                result = None
+            out[symbol] = result
+        return out
+
+    async def _info(self, session, symbol):
+        for attempt in range(2):
+            async with self._sem:
+                async with session.get(SUMMARY_URL.format(symbol=symbol),
+                                       params={"modules": MODULES, "crumb": self._crumb}) as resp:
+                    if resp.status == 401 and attempt == 0:
+                        await self._new_crumb(stale=self._crumb)
+                        continue
+                    if resp.status == 404:
+                        return {}
+                    resp.raise_for_status()
+                    body = await resp.json()
+            result = ((body.get("quoteSummary") or {}).get("result") or [{}])[0]
+            info   = flatten(result)
+            dates  = ((result.get("calendarEvents") or {}).get("earnings") or {}).get("earningsDate") or []
+            info["earningsDate"] = dates[0].get("fmt") if dates else None
+            return info
+
+    async def _ready(self):
+        if self._session is None:
+            self._sem     = asyncio.Semaphore(YAHOO_CONCURRENCY)
+            self._renew   = asyncio.Lock()
+            self._session = aiohttp.ClientSession(
+                headers=HEADERS,
+                connector=aiohttp.TCPConnector(limit=YAHOO_CONCURRENCY, limit_per_host=YAHOO_POOL_PER_HOST,
+                                               keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(connect=YAHOO_CONNECT_TIMEOUT, sock_read=YAHOO_READ_TIMEOUT),
+            )
+        if self._crumb is None:
+            await self._new_crumb(stale=None)
+        return self._session
+
+    async def _new_crumb(self, stale):
+        async with self._renew:
+            if self._crumb != stale:   # another request renewed it meanwhile
+                return
+            try:
+                async with self._session.get(COOKIE_URL, allow_redirects=True):
+                    pass   # only the Set-Cookie matters; fc.yahoo.com answers 404
+            except aiohttp.ClientError:
+                pass
+            async with self._session.get(CRUMB_URL) as resp:
+                resp.raise_for_status()
+                self._crumb = (await resp.text()).strip()
+
+
+yahoo = YahooClient()
@@ -8,6 +8,7 @@ import {
 const API       = "https://quantdesk-api.onrender.com/api";
 const ML_API    = "https://quantdesk-ml.onrender.com/api";
 const AGENT_API = "https://quantdesk-agent.onrender.com/agent";
+const POLL_MS   = 60000;   // quote polling when the live stream is unavailable
 
 /* ── GLOBAL STYLES ── */
 const GlobalStyles = () => (
@@ -186,6 +187,7 @@ function AIChat({ selectedStock }) {
   ]);
   const [input, setInput]     = useState("");
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const bottomRef = useRef();
 
   useEffect(() => { bottomRef.current?.scrollIntoView({ behavior:"smooth" }); }, [messages]);
@@ -200,8 +202,9 @@ function AIChat({ selectedStock }) {
     setInput("");
     setMessages(m => [...m, { role:"user", content:userMsg }]);
     setLoading(true);
+    setStreaming(false);
     try {
-      const res = await fetch(`${AGENT_API}/analyze`, {
+      const res = await fetch(`${AGENT_API}/analyze/stream`, {
         method:"POST",
         headers:{ "Content-Type":"application/json" },
         body: JSON.stringify({
@@ -210,12 +213,35 @@ function AIChat({ selectedStock }) {
           history:  messages.slice(-6),
         })
       });
-      const data = await res.json();
-      if (data.error) throw new Error(data.error);
-      setMessages(m => [...m, { role:"assistant", content:data.answer }]);
+      if (!res.ok) throw new Error((await res.json()).error || `HTTP ${res.status}`);
+
+      // SSE over fetch (EventSource cannot POST): "token" frames append to the
+      // reply, "reset" drops a partial reply when the agent switches engine
+      const reader  = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "", answer = "";
+      const show = text => setMessages(m => {
+        const last = m[m.length - 1];
+        return last?.streaming ? [...m.slice(0, -1), { ...last, content:text }] : [...m, { role:"assistant", content:text, streaming:true }];
+      });
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream:true });
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data  = frame.match(/^data: (.*)$/m)?.[1];
+          if (!event || !data) continue;
+          if (event === "token") { answer += JSON.parse(data).text; setStreaming(true); show(answer); }
+          if (event === "reset") { answer = ""; show(answer); }
+        }
+      }
+      setMessages(m => m.map(x => x.streaming ? { role:x.role, content:x.content } : x));
     } catch (e) {
-      setMessages(m => [...m, { role:"assistant", content:`⚠ ${e.message}\n\nMake sure **agent_server.py** is running:\n\`python agent_server.py\`` }]);
-    } finally { setLoading(false); }
+      setMessages(m => [...m.filter(x => !x.streaming), { role:"assistant", content:`⚠ ${e.message}\n\nMake sure **agent_server.py** is running:\n\`python agent_server.py\`` }]);
+    } finally { setLoading(false); setStreaming(false); }
   }
 
   function renderInline(text) {
@@ -305,7 +331,7 @@ function AIChat({ selectedStock }) {
             </div>
           </div>
         ))}
-        {loading && (
+        {loading && !streaming && (
           <div style={{ display:"flex", alignItems:"flex-start", gap:8 }}>
             <div style={{ width:20, height:20, borderRadius:2, background:"#0F1A2E", border:"1px solid #243048", display:"flex", alignItems:"center", justifyContent:"center", flexShrink:0 }}>
               <span style={{ fontFamily:"var(--mono)", fontSize:8, color:"#F0C040" }}>AI</span>
@@ -370,26 +396,67 @@ export default function App() {
     return () => controller.abort();
   }, [watchlist]);
 
+  // Live prices: the server pushes only the fields that changed. If it refuses
+  // the stream (503 when all stream slots are taken) fall back to polling.
+  useEffect(() => {
+    let timer = null;
+    const merge = data => {
+      if (data.length) setStocks(prev => prev.map(s => data.find(q => q.symbol === s.symbol) || s));
+    };
+    const poll = () => {
+      fetch(`${API}/stocks?symbols=${watchlist.join(",")}`)
+        .then(r => r.ok ? r.json() : [])
+        .then(merge)
+        .catch(() => {});
+    };
+    const fallBack = () => { if (!timer) timer = setInterval(poll, POLL_MS); };
+    if (typeof EventSource === "undefined") {
+      fallBack();
+      return () => clearInterval(timer);
+    }
+    const source = new EventSource(`${API}/stream?symbols=${watchlist.join(",")}`);
+    source.addEventListener("snapshot", e => merge(JSON.parse(e.data)));
+    source.addEventListener("delta", e => {
+      const changes = JSON.parse(e.data);
+      setStocks(prev => prev.map(s => changes[s.symbol] ? { ...s, ...changes[s.symbol] } : s));
+    });
+    // A refused stream is CLOSED; a dropped one is CONNECTING and the browser retries it
+    source.onerror = () => { if (source.readyState === EventSource.CLOSED) fallBack(); };
+    return () => { source.close(); clearInterval(timer); };
+  }, [watchlist]);
+
+  // Keyed on the symbol, not the stocks array — live quote ticks must not reload the chart or clear a forecast
+  const selectedSymbol = stocks[Math.min(idx, stocks.length - 1)]?.symbol;
+
   useEffect(() => {
-    if (!stocks.length) return;
-    const symbol = stocks[Math.min(idx, stocks.length - 1)]?.symbol;
-    if (!symbol) return;
+    if (!selectedSymbol) return;
     setLoadingHistory(true);
     setMlPrediction(null);
     setShowForecast(false);
     setMlError(null);
-    fetch(`${API}/history/${symbol}?days=${timeRange}`)
+    fetch(`${API}/history/${selectedSymbol}?days=${timeRange}`)
       .then(r => r.json())
       .then(data => { setHistory(Array.isArray(data) ? data : []); setLoadingHistory(false); })
       .catch(() => setLoadingHistory(false));
-  }, [idx, stocks, timeRange]);
+  }, [selectedSymbol, timeRange]);
 
   async function runPrediction() {
     if (!stock) return;
     setMlLoading(true); setMlError(null); setMlPrediction(null); setShowForecast(false);
     try {
-      const res  = await fetch(`${ML_API}/predict/${stock.symbol}`);
-      const data = await res.json();
+      let res  = await fetch(`${ML_API}/predict/${stock.symbol}`);
+      let data = await res.json();
+      if (res.status === 202 && data.jobId) {
+        // No model yet — training runs in the background, poll until it finishes
+        let job = data;
+        while (job.status === "queued" || job.status === "running" || job.status === "training") {
+          await new Promise(r => setTimeout(r, 3000));
+          job = await (await fetch(`${ML_API}/jobs/${data.jobId}`)).json();
+        }
+        if (job.status !== "done") throw new Error(job.error || "Training failed");
+        res  = await fetch(`${ML_API}/predict/${stock.symbol}`);
+        data = await res.json();
+      }
       if (data.error) throw new Error(data.error);
       setMlPrediction(data); setShowForecast(true);
     } catch (e) { setMlError(e.message); }
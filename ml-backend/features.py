@@ -0,0 +1,286 @@
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+FEATURE_COLUMNS = [
+    "close", "volume", "rsi", "macd", "macd_sig", "bb_upper", "bb_lower",
+    "bb_width", "return_1", "return_5", "return_10", "sma_20", "sma_50", "ema_12",
+]
+
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_PERIOD  = 20
+WARMUP     = 49   # bars before every indicator is defined (sma_50 is the longest)
+
+
+# ── VECTORISED INDICATORS ─────────────────────────────────────────
+# Every helper takes a (symbols, dates) float64 array and works along the
+# last axis, so a whole watchlist is one NumPy call per indicator. Results
+# match the pandas rolling()/ewm() defaults used previously: rolling windows
+# are NaN until full, std uses ddof=1 and ewm uses adjust=True.
+
+def rolling_mean(x, window):
+    out = np.full_like(x, np.nan)
+    if x.shape[-1] < window:
+        return out
+    c = np.cumsum(x, axis=-1)
+    out[..., window - 1] = c[..., window - 1]
+    out[..., window:] = c[..., window:] - c[..., :-window]
+    out[..., window - 1:] /= window
+    return out
+
+
+def rolling_std(x, window):
+    # Centre each series first so the sum-of-squares form stays well conditioned
+    x   = x - x.mean(axis=-1, keepdims=True)
+    m   = rolling_mean(x, window)
+    m2  = rolling_mean(x * x, window)
+    var = (m2 - m * m) * window / (window - 1)
+    return np.sqrt(np.clip(var, 0, None))
+
+
+def ewm_mean(x, span):
+    beta = 1 - 2 / (span + 1)
+    num  = lfilter([1.0], [1.0, -beta], x, axis=-1)
+    t    = np.arange(x.shape[-1])
+    den  = (1 - beta ** (t + 1)) / (1 - beta)
+    return num / den
+
+
+def pct_change(x, periods):
+    out = np.full_like(x, np.nan)
+    out[..., periods:] = x[..., periods:] / x[..., :-periods] - 1
+    return out
+
+
+def rsi(close, period=RSI_PERIOD):
+    delta = np.diff(close, axis=-1)
+    gain  = rolling_mean(np.clip(delta, 0, None), period)
+    loss  = rolling_mean(np.clip(-delta, 0, None), period)
+    out   = 100 - 100 / (1 + gain / (loss + 1e-9))
+    pad   = np.full(close.shape[:-1] + (1,), np.nan)
+    return np.concatenate([pad, out], axis=-1)
+
+
+# ── FEATURE ENGINE ────────────────────────────────────────────────
+def feature_tensor(close, volume):
+    """All FEATURE_COLUMNS for a (symbols, dates) close/volume pair.
+
+    Returns a float64 (symbols, dates, features) array; the first WARMUP
+    dates are NaN.
+    """
+    close  = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+
+    ema_fast = ewm_mean(close, MACD_FAST)
+    macd     = ema_fast - ewm_mean(close, MACD_SLOW)
+    sma_bb   = rolling_mean(close, BB_PERIOD)
+    std_bb   = rolling_std(close, BB_PERIOD)
+    bb_upper = sma_bb + 2 * std_bb
+    bb_lower = sma_bb - 2 * std_bb
+
+    columns = {
+        "close":     close,
+        "volume":    volume,
+        "rsi":       rsi(close),
+        "macd":      macd,
+        "macd_sig":  ewm_mean(macd, MACD_SIGNAL),
+        "bb_upper":  bb_upper,
+        "bb_lower":  bb_lower,
+        "bb_width":  bb_upper - bb_lower,
+        "return_1":  pct_change(close, 1),
+        "return_5":  pct_change(close, 5),
+        "return_10": pct_change(close, 10),
+        "sma_20":    sma_bb,
+        "sma_50":    rolling_mean(close, 50),
+        "ema_12":    ema_fast,
+    }
+    return np.stack([columns[c] for c in FEATURE_COLUMNS], axis=-1)
+
+
+def build_feature_panel(close, volume, dtype=np.float32):
+    """Features for a whole watchlist in one vectorised pass.
+
+    close and volume are wide DataFrames (dates x symbols) with the same
+    layout, e.g. the "Close"/"Volume" blocks of a multi-ticker yf.download.
+    Gaps are forward-filled, symbols with no data at all are left out and
+    dates before every remaining symbol has traded are dropped, so the panel
+    starts where the youngest symbol's history does.
+
+    Returns (values, dates, symbols) where values is a (symbols, dates,
+    features) array of `dtype`, ready to window for StockTransformer.
+    """
+    close  = close.sort_index().ffill().dropna(axis=1, how="all")
+    volume = volume.reindex_like(close).fillna(0)
+    listed = close.notna().all(axis=1).to_numpy()
+    close, volume = close[listed], volume[listed]
+
+    values = feature_tensor(close.to_numpy().T, volume.to_numpy().T)[:, WARMUP:]
+    return values.astype(dtype, copy=False), close.index[WARMUP:], list(close.columns)
+
+
+# ── TRAINING SEQUENCES ────────────────────────────────────────────
+def make_sequences(features_scaled, target_scaled, seq_len, pred_days):
+    """Return (X, y) as strided views over the inputs — no window is copied.
+
+    X[i] is features[i:i + seq_len] and y[i] the next pred_days targets. The
+    views are read-only; copy a slice if it has to be written to.
+    """
+    features = np.ascontiguousarray(features_scaled, dtype=np.float32)
+    target   = np.ascontiguousarray(np.asarray(target_scaled)[:, 0], dtype=np.float32)
+    n = len(features) - seq_len - pred_days + 1
+    if n <= 0:
+        return (np.empty((0, seq_len, features.shape[1]), dtype=np.float32),
+                np.empty((0, pred_days), dtype=np.float32))
+    X = sliding_window_view(features, seq_len, axis=0)[:n].transpose(0, 2, 1)   # (n, seq_len, F)
+    y = sliding_window_view(target, pred_days)[seq_len:seq_len + n]              # (n, pred_days)
+    return X, y
+
+
+# ── STREAMING INDICATORS ──────────────────────────────────────────
+class IndicatorState:
+    """Running indicator state for one symbol; update() is O(1) per bar.
+
+    Keeps the adjusted-EMA numerator/denominator pairs for ema_12, ema_26 and
+    the MACD signal line, running sums (and sum of squares) for the 20- and
+    50-bar windows, and running gain/loss sums for RSI. Rows produced by
+    update() match feature_tensor() on the full history.
+    """
+
+    SPANS   = {"ema_fast": MACD_FAST, "ema_slow": MACD_SLOW, "signal": MACD_SIGNAL}
+    RESYNC  = 1000   # re-add the window sums from scratch this often to stop drift
+
+    def __init__(self):
+        self.ema      = {name: [0.0, 0.0] for name in self.SPANS}   # name -> [num, den]
+        self.closes   = deque(maxlen=51)   # last 50 bars plus the one leaving sma_50
+        self.moves    = deque()            # last RSI_PERIOD (gain, loss) pairs
+        self.gain_sum = self.loss_sum = 0.0
+        self.sum_20 = self.sumsq_20 = self.sum_50 = 0.0
+        self.bars     = 0
+
+    @classmethod
+    def from_history(cls, close):
+        """Prime the state from a close series (oldest first).
+
+        The EMA pairs come from the vectorised engine, so priming costs one
+        NumPy pass rather than a Python loop over the whole history.
+        """
+        close = np.asarray(close, dtype=np.float64)
+        state = cls()
+        n     = len(close)
+        if n == 0:
+            return state
+        macd = ewm_mean(close, MACD_FAST) - ewm_mean(close, MACD_SLOW)
+        for name, series in (("ema_fast", close), ("ema_slow", close), ("signal", macd)):
+            beta = 1 - 2 / (cls.SPANS[name] + 1)
+            den  = (1 - beta ** n) / (1 - beta)
+            state.ema[name] = [float(ewm_mean(series, cls.SPANS[name])[-1] * den), den]
+        state.closes.extend(close[-51:].tolist())
+        deltas = np.diff(close[-(RSI_PERIOD + 1):])
+        state.moves.extend((max(d, 0.0), max(-d, 0.0)) for d in deltas)
+        state.bars = n
+        state._resync()
+        return state
+
+    def update(self, close, volume):
+        """Fold in one new bar and return its feature row (FEATURE_COLUMNS order)."""
+        close, volume = float(close), float(volume)
+        c = self.closes
+        if c:
+            delta = close - c[-1]
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            self.moves.append((gain, loss))
+            self.gain_sum += gain
+            self.loss_sum += loss
+            if len(self.moves) > RSI_PERIOD:
+                old_gain, old_loss = self.moves.popleft()
+                self.gain_sum -= old_gain
+                self.loss_sum -= old_loss
+
+        c.append(close)
+        self.sum_20   += close
+        self.sumsq_20 += close * close
+        self.sum_50   += close
+        if len(c) > BB_PERIOD:
+            old = c[-BB_PERIOD - 1]
+            self.sum_20   -= old
+            self.sumsq_20 -= old * old
+        if len(c) > 50:
+            self.sum_50 -= c[0]
+        self.bars += 1
+        if self.bars % self.RESYNC == 0:
+            self._resync()
+
+        ema_fast = self._ema("ema_fast", close)
+        macd     = ema_fast - self._ema("ema_slow", close)
+        macd_sig = self._ema("signal", macd)
+        return self._row(close, volume, ema_fast, macd, macd_sig)
+
+    def _ema(self, name, x):
+        beta = 1 - 2 / (self.SPANS[name] + 1)
+        pair = self.ema[name]
+        pair[0] = x + beta * pair[0]
+        pair[1] = 1 + beta * pair[1]
+        return pair[0] / pair[1]
+
+    def _row(self, close, volume, ema_fast, macd, macd_sig):
+        c   = self.closes
+        nan = float("nan")
+        if len(self.moves) == RSI_PERIOD:
+            gain = self.gain_sum / RSI_PERIOD
+            loss = self.loss_sum / RSI_PERIOD
+            rsi_ = 100 - 100 / (1 + gain / (loss + 1e-9))
+        else:
+            rsi_ = nan
+        if len(c) >= BB_PERIOD:
+            sma_20 = self.sum_20 / BB_PERIOD
+            var    = (self.sumsq_20 - self.sum_20 * sma_20) / (BB_PERIOD - 1)
+            std    = max(var, 0.0) ** 0.5
+            bb_upper, bb_lower = sma_20 + 2 * std, sma_20 - 2 * std
+        else:
+            sma_20 = bb_upper = bb_lower = nan
+        columns = {
+            "close":     close,
+            "volume":    volume,
+            "rsi":       rsi_,
+            "macd":      macd,
+            "macd_sig":  macd_sig,
+            "bb_upper":  bb_upper,
+            "bb_lower":  bb_lower,
+            "bb_width":  bb_upper - bb_lower,
+            "return_1":  close / c[-2] - 1 if len(c) > 1 else nan,
+            "return_5":  close / c[-6] - 1 if len(c) > 5 else nan,
+            "return_10": close / c[-11] - 1 if len(c) > 10 else nan,
+            "sma_20":    sma_20,
+            "sma_50":    self.sum_50 / 50 if len(c) >= 50 else nan,
+            "ema_12":    ema_fast,
+        }
+        return np.array([columns[k] for k in FEATURE_COLUMNS])
+
+    def _resync(self):
+        window_20 = list(self.closes)[-BB_PERIOD:]
+        self.sum_20   = float(sum(window_20))
+        self.sumsq_20 = float(sum(x * x for x in window_20))
+        self.sum_50   = float(sum(list(self.closes)[-50:]))
+        self.gain_sum = float(sum(g for g, _ in self.moves))
+        self.loss_sum = float(sum(l for _, l in self.moves))
+
+    def to_dict(self):
+        return {
+            "ema":    {k: list(v) for k, v in self.ema.items()},
+            "closes": list(self.closes),
+            "moves":  list(self.moves),
+            "bars":   self.bars,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.ema = {k: list(v) for k, v in d["ema"].items()}
+        state.closes.extend(d["closes"])
+        state.moves.extend(tuple(m) for m in d["moves"])
+        state.bars = d["bars"]
+        state._resync()
+        return state
@@ -0,0 +1,104 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ── TRAINING JOB QUEUE ────────────────────────────────────────────
+class JobQueue:
+    """Bounded background pool for training runs.
+
+    `run(symbol, progress, **options)` does the actual work; it is called on
+    a worker thread with the options given to submit() and reports
+    `progress(epoch, epochs, loss, val_loss)` as it goes. At most one job per
+    symbol is active at a time — submitting a symbol that is already queued
+    or running returns the existing job. Finished jobs are kept for polling
+    until `keep` newer ones push them out.
+    """
+
+    def __init__(self, run, max_workers=1, keep=200):
+        self._run     = run
+        self._pool    = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="train")
+        self._lock    = threading.Lock()
+        self._jobs    = OrderedDict()   # id -> job dict
+        self._active  = {}              # symbol -> id
+        self._ids     = itertools.count(1)
+        self._keep    = keep
+
+    def submit(self, symbol, **options):
+        with self._lock:
+            active = self._active.get(symbol)
+            if active is not None:
+                return dict(self._jobs[active])
+            job_id = f"{symbol}-{int(time.time())}-{next(self._ids)}"
+            job = {
+                "id":         job_id,
+                "symbol":     symbol,
+                "status":     "queued",
+                "epoch":      0,
+                "epochs":     None,
+                "loss":       None,
+                "valLoss":    None,
+                "error":      None,
+                "createdAt":  time.time(),
+                "startedAt":  None,
+                "finishedAt": None,
+            }
+            self._jobs[job_id]    = job
+            self._active[symbol]  = job_id
+            self._trim()
+            snapshot = dict(job)
+        self._pool.submit(self._execute, job_id, options)
+        return snapshot
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def active_for(self, symbol):
+        with self._lock:
+            job_id = self._active.get(symbol)
+            return dict(self._jobs[job_id]) if job_id else None
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _execute(self, job_id, options):
+        symbol = self._jobs[job_id]["symbol"]
+        self._update(job_id, status="running", startedAt=time.time())
+
+        def progress(epoch, epochs, loss, val_loss=None):
+            self._update(job_id, epoch=epoch, epochs=epochs, loss=round(float(loss), 6),
+                         valLoss=None if val_loss is None else round(float(val_loss), 6))
+
+        try:
+            self._run(symbol, progress, **options)
+            self._update(job_id, status="done", finishedAt=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=str(e), finishedAt=time.time())
+        finally:
+            with self._lock:
+                if self._active.get(symbol) == job_id:
+                    del self._active[symbol]
+
+    def _trim(self):
+        # Drop the oldest finished jobs once we hold more than `keep`
+        while len(self._jobs) > self._keep:
+            for job_id, job in self._jobs.items():
+                if job["status"] in ("done", "failed"):
+                    del self._jobs[job_id]
+                    break
+            else:
+                return
@@ -1,12 +1,26 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import yfinance as yf
 import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
+from torch.utils.data import ConcatDataset, DataLoader, Dataset
 from sklearn.preprocessing import MinMaxScaler
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import sys
+import threading
+import time
 import warnings
+from features import FEATURE_COLUMNS, IndicatorState, build_feature_panel, make_sequences
+from jobs import JobQueue
+from model_registry import ModelRegistry
+
+# Price history comes from the OHLCV store shared with the API services
+sys.path.append(str(Path(__file__).resolve().parent.parent / "backend"))
+from bar_store import bars
+from shared_cache import SingleFlight
 warnings.filterwarnings("ignore")
 
 app = Flask(__name__)
@@ -19,52 +33,54 @@ D_MODEL      = 64      # transformer embedding size
 N_HEADS      = 4       # attention heads
 N_LAYERS     = 2       # transformer encoder layers
 DROPOUT      = 0.1
-EPOCHS       = 40
+EPOCHS       = 40      # upper bound — early stopping usually ends sooner
 LR           = 0.001
+BATCH_SIZE   = int(os.getenv("BATCH_SIZE", 64))
+PATIENCE     = int(os.getenv("PATIENCE", 8))     # epochs without val improvement
+VAL_FRACTION = 0.15
 DEVICE       = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+MODEL_DIR    = os.getenv("MODEL_DIR", str(Path(__file__).parent / "models"))
+MAX_STALE_BDAYS = int(os.getenv("MODEL_MAX_STALE_BDAYS", 1))  # retrain once data is older
+TRAIN_WORKERS   = int(os.getenv("TRAIN_WORKERS", 1))          # concurrent background trainings
+LIVE_REFRESH_SECONDS = int(os.getenv("LIVE_REFRESH_SECONDS", 300))  # how often to look for new bars
+LIVE_STALE_SECONDS   = int(os.getenv("LIVE_STALE_SECONDS", 3600))    # ...serving the old window meanwhile
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", 8))        # parallel loads/refreshes in batch predict
+MAX_BATCH       = 100
+GLOBAL_MODEL    = os.getenv("GLOBAL_MODEL", "0") == "1"        # serve from one cross-symbol model
+GLOBAL_KEY      = "__GLOBAL__"                                # registry name of the global model
+GLOBAL_UNIVERSE = os.getenv("GLOBAL_UNIVERSE",
+                            "NVDA,AAPL,TSLA,AMZN,MSFT,META,GOOGL,NFLX,AMD,COIN").split(",")
+SYMBOL_DROPOUT  = 0.1   # share of training windows shown as "unknown symbol" (id 0)
 
 print(f"Using device: {DEVICE}")
 
 # ── TECHNICAL INDICATORS ──────────────────────────────────────────
-def compute_rsi(series, period=14):
-    delta = series.diff()
-    gain  = delta.clip(lower=0).rolling(period).mean()
-    loss  = (-delta.clip(upper=0)).rolling(period).mean()
-    rs    = gain / (loss + 1e-9)
-    return 100 - (100 / (1 + rs))
-
-def compute_macd(series, fast=12, slow=26, signal=9):
-    ema_fast   = series.ewm(span=fast).mean()
-    ema_slow   = series.ewm(span=slow).mean()
-    macd_line  = ema_fast - ema_slow
-    signal_line = macd_line.ewm(span=signal).mean()
-    return macd_line, signal_line
-
-def compute_bollinger(series, period=20):
-    sma  = series.rolling(period).mean()
-    std  = series.rolling(period).std()
-    upper = sma + 2 * std
-    lower = sma - 2 * std
-    return upper, lower
-
-def build_features(df):
-    close = df["Close"]
-    feat = pd.DataFrame(index=df.index)
-    feat["close"]    = close
-    feat["volume"]   = df["Volume"]
-    feat["rsi"]      = compute_rsi(close)
-    feat["macd"], feat["macd_sig"] = compute_macd(close)
-    feat["bb_upper"], feat["bb_lower"] = compute_bollinger(close)
-    feat["bb_width"] = feat["bb_upper"] - feat["bb_lower"]
-    feat["return_1"] = close.pct_change(1)
-    feat["return_5"] = close.pct_change(5)
-    feat["return_10"]= close.pct_change(10)
-    feat["sma_20"]   = close.rolling(20).mean()
-    feat["sma_50"]   = close.rolling(50).mean()
-    feat["ema_12"]   = close.ewm(span=12).mean()
-    feat = feat.dropna()
+def build_features(df, with_state=False):
+    """FEATURE_COLUMNS for one OHLCV frame — a one-symbol panel through the
+    vectorised engine in features.py, which is also used for whole watchlists.
+
+    With with_state=True also returns the IndicatorState at the last bar, so
+    later bars can be folded in one at a time instead of rebuilding.
+    """
+    values, dates, _ = build_feature_panel(df["Close"].to_frame("symbol"),
+                                           df["Volume"].to_frame("symbol"), dtype=np.float64)
+    feat = pd.DataFrame(values[0], index=dates, columns=FEATURE_COLUMNS).dropna()
+    if with_state:
+        return feat, IndicatorState.from_history(df["Close"].ffill().to_numpy())
     return feat
 
+
+def provisional_base(close, window, dates):
+    """The IndicatorState, feature window and window dates from before the
+    last bar. That bar may be today's, still changing until the close, so
+    live_window starts from here and replaces it rather than keeping the
+    training-time price. window and dates hold at least SEQ_LEN + 1 rows."""
+    return {
+        "indicators":   IndicatorState.from_history(close[:-1]).to_dict(),
+        "window":       np.asarray(window)[-SEQ_LEN - 1:-1],
+        "window_dates": [ts.strftime("%Y-%m-%d") for ts in dates[-SEQ_LEN - 1:-1]],
+    }
+
 # ── TRANSFORMER MODEL ─────────────────────────────────────────────
 class PositionalEncoding(nn.Module):
     def __init__(self, d_model, max_len=500, dropout=0.1):
@@ -84,9 +100,12 @@ class PositionalEncoding(nn.Module):
 
 class StockTransformer(nn.Module):
     def __init__(self, n_features, d_model=D_MODEL, n_heads=N_HEADS,
-                 n_layers=N_LAYERS, pred_days=PRED_DAYS, dropout=DROPOUT):
+                 n_layers=N_LAYERS, pred_days=PRED_DAYS, dropout=DROPOUT, n_symbols=0):
         super().__init__()
         self.input_proj = nn.Linear(n_features, d_model)
+        # Global mode: a learned per-symbol offset on the projected input.
+        # Row 0 is the "unknown symbol" embedding used for zero-shot forecasts.
+        self.symbol_emb = nn.Embedding(n_symbols + 1, d_model) if n_symbols else None
         self.pos_enc    = PositionalEncoding(d_model, dropout=dropout)
         encoder_layer   = nn.TransformerEncoderLayer(
             d_model=d_model, nhead=n_heads,
@@ -101,8 +120,13 @@ class StockTransformer(nn.Module):
             nn.Linear(d_model // 2, pred_days)
         )
 
-    def forward(self, x):
+    def forward(self, x, symbol_ids=None):
         x = self.input_proj(x)       # (B, seq, d_model)
+        if self.symbol_emb is not None and symbol_ids is not None:
+            if self.training:
+                drop = torch.rand(symbol_ids.shape, device=symbol_ids.device) < SYMBOL_DROPOUT
+                symbol_ids = symbol_ids.masked_fill(drop, 0)
+            x = x + self.symbol_emb(symbol_ids).unsqueeze(1)
         x = self.pos_enc(x)
         x = self.transformer(x)      # (B, seq, d_model)
         x = x[:, -1, :]             # take last timestep
@@ -110,72 +134,428 @@ class StockTransformer(nn.Module):
 
 
 # ── DATASET BUILDER ───────────────────────────────────────────────
-def make_sequences(features_scaled, target_scaled, seq_len, pred_days):
-    X, y = [], []
-    total = len(features_scaled)
-    for i in range(seq_len, total - pred_days + 1):
-        X.append(features_scaled[i - seq_len:i])
-        y.append(target_scaled[i:i + pred_days, 0])
-    return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32)
+class SequenceDataset(Dataset):
+    """Lazy (window, target) pairs over a feature matrix.
+
+    Indexes the strided views from make_sequences, so the (T, F) matrix is
+    held once and a window is only copied out per __getitem__ — a DataLoader
+    materialises one batch of windows at a time. start/stop select a
+    contiguous range of sequence indices, e.g. the train/validation split.
+    With symbol_id set, items also carry that id for the global model.
+    """
+
+    def __init__(self, features_scaled, target_scaled, seq_len, pred_days,
+                 start=0, stop=None, symbol_id=None):
+        self.X, self.y = make_sequences(features_scaled, target_scaled, seq_len, pred_days)
+        self.symbol_id = None if symbol_id is None else torch.tensor(symbol_id)
+        total = len(self.X)
+        self.start = min(start, total)
+        self.stop  = total if stop is None else min(stop, total)
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __getitem__(self, idx):
+        i = self.start + idx
+        x, y = torch.tensor(self.X[i]), torch.tensor(self.y[i])   # the views are read-only
+        if self.symbol_id is None:
+            return x, y
+        return x, y, self.symbol_id
+
+
+# ── MODEL REGISTRY ────────────────────────────────────────────────
+registry = ModelRegistry(MODEL_DIR, {
+    "seq_len":   SEQ_LEN,
+    "pred_days": PRED_DAYS,
+    "d_model":   D_MODEL,
+    "n_heads":   N_HEADS,
+    "n_layers":  N_LAYERS,
+    "features":  FEATURE_COLUMNS,
+}, max_stale_bdays=MAX_STALE_BDAYS)
+
+_loaded_models = {}   # symbol -> (saved_at, model) so weights are built once per artifact
+predict_pool   = ThreadPoolExecutor(max_workers=PREDICT_WORKERS, thread_name_prefix="predict")
+
+def load_model(symbol, artifact):
+    # Every symbol served by the global model shares one set of weights
+    key    = artifact.get("model_key", symbol)
+    cached = _loaded_models.get(key)
+    if cached and cached[0] == artifact["saved_at"]:
+        return cached[1]
+    model = StockTransformer(n_features=artifact["n_features"],
+                             n_symbols=artifact.get("n_symbols", 0)).to(DEVICE)
+    model.load_state_dict(artifact["state_dict"])
+    model.eval()
+    _loaded_models[key] = (artifact["saved_at"], model)
+    return model
 
 
 # ── TRAIN ─────────────────────────────────────────────────────────
-def train_model(symbol):
-    print(f"\n[{symbol}] Downloading data...")
-    ticker = yf.Ticker(symbol)
-    df = ticker.history(period="2y")
+def evaluate(model, loader, loss_fn):
+    model.eval()
+    total, count = 0.0, 0
+    with torch.no_grad():
+        for xb, yb, *ids in loader:
+            xb, yb = xb.to(DEVICE), yb.to(DEVICE)
+            pred   = model(xb, *(t.to(DEVICE) for t in ids))
+            total += loss_fn(pred, yb).item() * len(xb)
+            count += len(xb)
+    return total / count if count else float("nan")
+
+
+def fit_epochs(model, train_ds, val_ds, progress=None,
+               epochs=None, batch_size=None, patience=None):
+    """Mini-batch training with early stopping on the held-out tail.
+
+    Only one batch of activations is resident at a time, so memory does not
+    grow with the history length. The weights of the best validation epoch
+    are restored into `model` before returning.
+    """
+    epochs     = epochs or EPOCHS
+    batch_size = batch_size or BATCH_SIZE
+    patience   = patience or PATIENCE
+
+    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True)
+    val_loader   = DataLoader(val_ds, batch_size=batch_size * 4)
+    opt     = torch.optim.AdamW(model.parameters(), lr=LR, weight_decay=1e-4)
+    sched   = torch.optim.lr_scheduler.CosineAnnealingLR(opt, T_max=epochs)
+    loss_fn = nn.HuberLoss()
+
+    best = {"epoch": 0, "val_loss": float("inf"), "state": None, "epochs_run": 0}
+    for epoch in range(1, epochs + 1):
+        model.train()
+        total, count = 0.0, 0
+        for xb, yb, *ids in train_loader:
+            xb, yb = xb.to(DEVICE), yb.to(DEVICE)
+            opt.zero_grad()
+            loss = loss_fn(model(xb, *(t.to(DEVICE) for t in ids)), yb)
+            loss.backward()
+            nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            opt.step()
+            total += loss.item() * len(xb)
+            count += len(xb)
+        sched.step()
+
+        train_loss = total / count
+        val_loss   = evaluate(model, val_loader, loss_fn) if len(val_ds) else train_loss
+        best["epochs_run"] = epoch
+        if progress:
+            progress(epoch, epochs, train_loss, val_loss)
+        if epoch % 10 == 0:
+            print(f"  Epoch {epoch}/{epochs}  loss={train_loss:.6f}  val_loss={val_loss:.6f}")
+
+        if val_loss < best["val_loss"]:
+            best.update(epoch=epoch, val_loss=val_loss,
+                        state={k: v.detach().clone() for k, v in model.state_dict().items()})
+        elif epoch - best["epoch"] >= patience:
+            print(f"  Early stop at epoch {epoch} — no improvement for {patience} epochs")
+            break
+
+    model.load_state_dict(best["state"])
+    model.eval()
+    return best
+
+
+def download_history(symbol):
+    print(f"\n[{symbol}] Loading data...")
+    df = bars.get(symbol, period="2y")
 
     if len(df) < SEQ_LEN + PRED_DAYS + 60:
         raise ValueError(f"Not enough data for {symbol}")
+    return df
 
-    feat = build_features(df)
+
+def fit_model(symbol, progress=None):
+    """Download history, train a fresh model and return its registry artifact.
+
+    progress, if given, is called as progress(epoch, epochs, loss, val_loss)
+    after every epoch.
+    """
+    df = download_history(symbol)
+    feat, indicators = build_features(df, with_state=True)
     n_features = feat.shape[1]
 
     # Scale features and target separately
     feat_scaler   = MinMaxScaler()
     target_scaler = MinMaxScaler()
 
-    feat_scaled   = feat_scaler.fit_transform(feat.values)
-    target_scaled = target_scaler.fit_transform(feat[["close"]].values)
+    feat_scaled   = feat_scaler.fit_transform(feat.values).astype(np.float32)
+    target_scaled = target_scaler.fit_transform(feat[["close"]].values).astype(np.float32)
 
-    X, y = make_sequences(feat_scaled, target_scaled, SEQ_LEN, PRED_DAYS)
+    n_seq    = max(len(feat_scaled) - SEQ_LEN - PRED_DAYS + 1, 0)
+    split    = int(n_seq * (1 - VAL_FRACTION))
+    train_ds = SequenceDataset(feat_scaled, target_scaled, SEQ_LEN, PRED_DAYS, stop=split)
+    val_ds   = SequenceDataset(feat_scaled, target_scaled, SEQ_LEN, PRED_DAYS, start=split)
 
-    split = int(len(X) * 0.85)
-    X_train, y_train = X[:split], y[:split]
+    model = StockTransformer(n_features=n_features).to(DEVICE)
+    print(f"[{symbol}] Training up to {EPOCHS} epochs on {len(train_ds)} sequences "
+          f"({len(val_ds)} held out)...")
+    best = fit_epochs(model, train_ds, val_ds, progress)
+    print(f"[{symbol}] Best epoch {best['epoch']}/{best['epochs_run']}  val_loss={best['val_loss']:.6f}")
 
-    X_t = torch.tensor(X_train).to(DEVICE)
-    y_t = torch.tensor(y_train).to(DEVICE)
+    window = feat.tail(SEQ_LEN)
+    return {
+        "symbol":        symbol,
+        "n_features":    n_features,
+        "state_dict":    {k: v.detach().cpu() for k, v in model.state_dict().items()},
+        "feat_scaler":   feat_scaler,
+        "target_scaler": target_scaler,
+        "window":        window.values,
+        "window_dates":  [ts.strftime("%Y-%m-%d") for ts in window.index],
+        "indicators":    indicators.to_dict(),
+        "base":          provisional_base(df["Close"].ffill().to_numpy(), feat.values, feat.index),
+        "watermark":     feat.index[-1].strftime("%Y-%m-%d"),
+        "trained_at":    time.time(),
+        "best_epoch":    best["epoch"],
+        "val_loss":      best["val_loss"],
+    }
 
-    model = StockTransformer(n_features=n_features).to(DEVICE)
-    opt   = torch.optim.AdamW(model.parameters(), lr=LR, weight_decay=1e-4)
-    sched = torch.optim.lr_scheduler.CosineAnnealingLR(opt, T_max=EPOCHS)
-    loss_fn = nn.HuberLoss()
 
-    print(f"[{symbol}] Training {EPOCHS} epochs on {len(X_train)} sequences...")
-    model.train()
-    for epoch in range(EPOCHS):
-        opt.zero_grad()
-        pred = model(X_t)
-        loss = loss_fn(pred, y_t)
-        loss.backward()
-        nn.utils.clip_grad_norm_(model.parameters(), 1.0)
-        opt.step()
-        sched.step()
-        if (epoch + 1) % 20 == 0:
-            print(f"  Epoch {epoch+1}/{EPOCHS}  loss={loss.item():.6f}")
+def fit_global_model(universe, progress=None):
+    """Train one StockTransformer on a pooled universe of symbols.
+
+    Each symbol keeps its own feature/target scalers and gets a learned
+    embedding (ids start at 1; 0 is the "unknown symbol" row that
+    SYMBOL_DROPOUT trains for zero-shot use). Returns a registry artifact
+    holding the shared weights plus every symbol's scalers, last window and
+    indicator state.
+    """
+    universe = list(dict.fromkeys(s.strip().upper() for s in universe if s.strip()))
+    print(f"\n[global] Loading {len(universe)} symbols...")
+    frames = {s: df for s, df in bars.get_many(universe, period="2y").items() if not df.empty}
+    if not frames:
+        raise ValueError(f"No data for {', '.join(universe)}")
+    # Features per symbol, on its own dates: a recently listed ticker must not
+    # cut everyone's history to its age, and windows never cross symbols
+    features, short = {}, []
+    for s, df in frames.items():
+        feat, state = build_features(df, with_state=True)
+        if len(feat) < SEQ_LEN + PRED_DAYS + 10:
+            short.append(s)
+        else:
+            features[s] = (df["Close"].ffill().to_numpy(), feat, state)
+    if short:
+        print(f"[global] Leaving out {', '.join(short)} — not enough history yet")
+    if not features:
+        raise ValueError("Not enough history for any symbol in the global universe")
+    symbols = list(features)
+
+    train_sets, val_sets = [], []
+    scalers, windows, window_dates, indicators, bases = {}, {}, {}, {}, {}
+    for symbol_id, symbol in enumerate(symbols, start=1):
+        closes, frame, state = features[symbol]
+        feat          = frame.values
+        feat_scaler   = MinMaxScaler()
+        target_scaler = MinMaxScaler()
+        feat_scaled   = feat_scaler.fit_transform(feat).astype(np.float32)
+        target_scaled = target_scaler.fit_transform(feat[:, :1]).astype(np.float32)
+
+        n_seq = max(len(feat) - SEQ_LEN - PRED_DAYS + 1, 0)
+        split = int(n_seq * (1 - VAL_FRACTION))
+        train_sets.append(SequenceDataset(feat_scaled, target_scaled, SEQ_LEN, PRED_DAYS,
+                                          stop=split, symbol_id=symbol_id))
+        val_sets.append(SequenceDataset(feat_scaled, target_scaled, SEQ_LEN, PRED_DAYS,
+                                        start=split, symbol_id=symbol_id))
+        scalers[symbol]      = (feat_scaler, target_scaler)
+        windows[symbol]      = feat[-SEQ_LEN:]
+        window_dates[symbol] = [ts.strftime("%Y-%m-%d") for ts in frame.index[-SEQ_LEN:]]
+        indicators[symbol]   = state.to_dict()
+        bases[symbol]        = provisional_base(closes, feat, frame.index)
+
+    train_ds, val_ds = ConcatDataset(train_sets), ConcatDataset(val_sets)
+    model = StockTransformer(n_features=len(FEATURE_COLUMNS), n_symbols=len(symbols)).to(DEVICE)
+    print(f"[global] Training up to {EPOCHS} epochs on {len(train_ds)} sequences "
+          f"from {len(symbols)} symbols ({len(val_ds)} held out)...")
+    best = fit_epochs(model, train_ds, val_ds, progress)
+    print(f"[global] Best epoch {best['epoch']}/{best['epochs_run']}  val_loss={best['val_loss']:.6f}")
 
-    # ── FORECAST ──────────────────────────────────────────────────
-    model.eval()
-    last_seq = torch.tensor(feat_scaled[-SEQ_LEN:]).unsqueeze(0).float().to(DEVICE)
-    with torch.no_grad():
-        pred_scaled = model(last_seq).cpu().numpy()[0]  # (pred_days,)
+    return {
+        "symbol":       GLOBAL_KEY,
+        "symbols":      symbols,
+        "n_symbols":    len(symbols),
+        "n_features":   len(FEATURE_COLUMNS),
+        "state_dict":   {k: v.detach().cpu() for k, v in model.state_dict().items()},
+        "scalers":      scalers,
+        "windows":      windows,
+        "window_dates": window_dates,
+        "indicators":   indicators,
+        "bases":        bases,
+        "watermark":    max(d[-1] for d in window_dates.values()),
+        "trained_at":   time.time(),
+        "best_epoch":   best["epoch"],
+        "val_loss":     best["val_loss"],
+    }
+
+
+_zero_shot = {}   # symbol -> view of an uncovered symbol on the current global model
+
+def global_view(shared, symbol):
+    """A per-symbol artifact served by the shared global weights.
+
+    Covered symbols use their trained embedding and scalers. Anything else
+    is forecast zero-shot: its own history fixes the scalers and window and
+    the model runs with the "unknown symbol" embedding.
+    """
+    view = {
+        "symbol":     symbol,
+        "model_key":  GLOBAL_KEY,
+        "saved_at":   shared["saved_at"],
+        "n_features": shared["n_features"],
+        "n_symbols":  shared["n_symbols"],
+        "state_dict": shared["state_dict"],
+    }
+    if symbol in shared["symbols"]:
+        feat_scaler, target_scaler = shared["scalers"][symbol]
+        return dict(view,
+                    symbol_id=shared["symbols"].index(symbol) + 1,
+                    feat_scaler=feat_scaler, target_scaler=target_scaler,
+                    window=shared["windows"][symbol],
+                    window_dates=shared["window_dates"][symbol],
+                    indicators=shared["indicators"][symbol],
+                    base=shared["bases"][symbol],
+                    watermark=shared["window_dates"][symbol][-1])
+
+    cached = _zero_shot.get(symbol)
+    if cached and cached["saved_at"] == shared["saved_at"]:
+        return cached
+    df          = download_history(symbol)
+    feat, state = build_features(df, with_state=True)
+    window      = feat.tail(SEQ_LEN)
+    view = dict(view,
+                symbol_id=0,
+                feat_scaler=MinMaxScaler().fit(feat.values),
+                target_scaler=MinMaxScaler().fit(feat[["close"]].values),
+                window=window.values,
+                window_dates=[ts.strftime("%Y-%m-%d") for ts in window.index],
+                indicators=state.to_dict(),
+                base=provisional_base(df["Close"].ffill().to_numpy(), feat.values, feat.index),
+                watermark=feat.index[-1].strftime("%Y-%m-%d"))
+    _zero_shot[symbol] = view
+    return view
+
+
+# ── FORECAST ──────────────────────────────────────────────────────
+_live       = {}   # symbol -> feature window rolled forward past the artifact
+_live_lock  = threading.Lock()
+live_flight = SingleFlight()
+
+def live_window(artifact):
+    """The artifact's feature window advanced by any bars that closed since
+    training. Each new bar is one IndicatorState.update — the two-year
+    history is never rebuilt — and the bar store is asked at most once every
+    LIVE_REFRESH_SECONDS per symbol. For LIVE_STALE_SECONDS after that the
+    current window is still served while it is rolled forward in the
+    background; concurrent refreshes of one symbol share a single fetch."""
+    symbol = artifact["symbol"]
+    with _live_lock:
+        entry = _live.get(symbol)
+        if entry is None or entry["saved_at"] != artifact["saved_at"]:
+            base  = artifact.get("base")   # absent on artifacts saved before it was recorded
+            entry = {
+                "saved_at":   artifact["saved_at"],
+                "lock":       threading.Lock(),
+                "checked_at": 0.0,
+                "window":     artifact["window"],
+                "dates":      list(artifact["window_dates"]),
+                "state":      IndicatorState.from_dict(artifact["indicators"]),
+                # (state, window, dates) before the provisional last bar — the artifact's own at first
+                "base":       base and (base["indicators"], base["window"], list(base["window_dates"])),
+            }
+            _live[symbol] = entry
+
+    age = time.time() - entry["checked_at"]
+    if age >= LIVE_REFRESH_SECONDS:
+        refresh = lambda: roll_forward(symbol, entry)
+        if entry["checked_at"] and age < LIVE_REFRESH_SECONDS + LIVE_STALE_SECONDS:
+            if not live_flight.running(symbol):
+                predict_pool.submit(live_flight.do, symbol, refresh)
+        else:
+            live_flight.do(symbol, refresh)
+    with entry["lock"]:
+        return entry["window"], entry["dates"]
+
+
+def roll_forward(symbol, entry):
+    """Fold bars newer than the live window into it.
+
+    The newest bar may be today's, still changing until the close, so it is
+    kept provisional: the state from before it is saved in entry["base"] and
+    the next refresh starts again from there, replacing that bar with its
+    latest (eventually closing) values instead of skipping its date.
+    """
+    entry["checked_at"] = time.time()
+    try:
+        recent = bars.get(symbol, period="1mo")
+    except Exception as e:
+        print(f"[{symbol}] Live update skipped: {e}")
+        return
+    with entry["lock"]:
+        if entry["base"]:
+            state, window, dates = entry["base"]
+            state = IndicatorState.from_dict(state)
+        else:
+            state, window, dates = IndicatorState.from_dict(entry["state"].to_dict()), entry["window"], entry["dates"]
+        new = [(ts.strftime("%Y-%m-%d"), bar) for ts, bar in recent.iterrows()
+               if ts.strftime("%Y-%m-%d") > dates[-1] and not pd.isna(bar["Close"])]
+        if not new:
+            return
+        for i, (day, bar) in enumerate(new):
+            if i == len(new) - 1:
+                base = (state.to_dict(), window, dates)
+            row    = state.update(bar["Close"], bar["Volume"])
+            window = np.vstack([window[1:], row])
+            dates  = dates[1:] + [day]
+        entry.update(state=state, window=window, dates=dates, base=base)
+
+
+def forecast(artifact, window=None, window_dates=None):
+    """Run inference from a registry artifact — no training. window/window_dates
+    override the artifact's stored feature window (see live_window)."""
+    if window is None:
+        window, window_dates = artifact["window"], artifact["window_dates"]
+    return forecast_batch([(artifact, window, window_dates)])[0]
+
+
+def forecast_batch(items):
+    """Forecast many (artifact, window, window_dates) items at once.
+
+    Items are grouped by the model they run on; each group's windows are
+    stacked into one (B, SEQ_LEN, F) tensor and scored in a single forward
+    pass. Groups run in parallel on the predict pool.
+    """
+    groups = {}
+    for i, (artifact, _, _) in enumerate(items):
+        model = load_model(artifact["symbol"], artifact)
+        groups.setdefault(id(model), (model, []))[1].append(i)
+
+    def score(group):
+        model, idxs = group
+        batch = np.stack([items[i][0]["feat_scaler"].transform(items[i][1]) for i in idxs])
+        extra = []
+        if model.symbol_emb is not None:
+            extra.append(torch.tensor([items[i][0].get("symbol_id", 0) for i in idxs], device=DEVICE))
+        with torch.no_grad():
+            out = model(torch.tensor(batch).float().to(DEVICE), *extra).cpu().numpy()  # (B, pred_days)
+        return idxs, out
+
+    preds = [None] * len(items)
+    runs  = map(score, groups.values()) if len(groups) == 1 else predict_pool.map(score, groups.values())
+    for idxs, out in runs:
+        for i, p in zip(idxs, out):
+            preds[i] = p
+    return [format_forecast(a, p, w, d) for (a, w, d), p in zip(items, preds)]
+
+
+def format_forecast(artifact, pred_scaled, window, window_dates):
+    symbol = artifact["symbol"]
 
     # Inverse transform
     dummy = np.zeros((PRED_DAYS, 1))
     dummy[:, 0] = pred_scaled
-    forecast_prices = target_scaler.inverse_transform(dummy)[:, 0].tolist()
+    forecast_prices = artifact["target_scaler"].inverse_transform(dummy)[:, 0].tolist()
 
-    current_price = float(feat["close"].iloc[-1])
+    closes        = window[:, FEATURE_COLUMNS.index("close")]
+    current_price = float(closes[-1])
     target_price  = float(forecast_prices[-1])
     delta_pct     = (target_price - current_price) / current_price * 100
 
@@ -187,8 +567,8 @@ def train_model(symbol):
     )
 
     # Build date axis for forecast
-    last_date = feat.index[-1]
-    future_dates = pd.bdate_range(last_date, periods=PRED_DAYS + 1)[1:]
+    hist_dates   = pd.to_datetime(window_dates)
+    future_dates = pd.bdate_range(hist_dates[-1], periods=PRED_DAYS + 1)[1:]
     forecast_series = [
         {"date": d.strftime("%b %d"), "predicted": round(p, 2)}
         for d, p in zip(future_dates, forecast_prices)
@@ -196,8 +576,8 @@ def train_model(symbol):
 
     # Historical prices for chart overlay
     hist_series = [
-        {"date": ts.strftime("%b %d"), "price": round(row["close"], 2)}
-        for ts, row in feat.tail(SEQ_LEN).iterrows()
+        {"date": ts.strftime("%b %d"), "price": round(float(p), 2)}
+        for ts, p in zip(hist_dates, closes)
     ]
 
     return {
@@ -209,22 +589,171 @@ def train_model(symbol):
         "forecast":     forecast_series,
         "history":      hist_series,
         "predDays":     PRED_DAYS,
+        "asOf":         window_dates[-1],
     }
 
 
-# ── ROUTE ─────────────────────────────────────────────────────────
+def train_model(symbol, progress=None, universe=None):
+    """Train and publish a new artifact to the registry. Runs on the job pool."""
+    if symbol == GLOBAL_KEY:
+        artifact = fit_global_model(universe or GLOBAL_UNIVERSE, progress)
+    else:
+        artifact = fit_model(symbol, progress)
+    registry.save(symbol, artifact)
+    return artifact
+
+
+jobs = JobQueue(train_model, max_workers=TRAIN_WORKERS)
+
+
+def latest_bar(symbols):
+    """Date of the newest daily bar in the store for any of symbols, or None
+    if it cannot be had. The store syncs at most once per refresh interval."""
+    try:
+        frames = bars.get_many(symbols, period="5d")
+    except Exception as e:
+        print(f"[ml] Could not check for new bars: {e}")
+        return None
+    days = [df.index[-1].strftime("%Y-%m-%d") for df in frames.values() if len(df)]
+    return max(days, default=None)
+
+
+def resolve_artifact(symbol):
+    """The artifact that should serve symbol, plus any training job queued
+    for it. The artifact is None while a symbol's first model trains.
+
+    In GLOBAL_MODEL mode every symbol is served by the global model once it
+    exists; per-symbol models are only used until then.
+    """
+    if GLOBAL_MODEL:
+        shared = registry.load(GLOBAL_KEY)
+        if shared is not None:
+            fresh = registry.is_fresh(shared, latest=latest_bar(shared["symbols"]))
+            job   = None if fresh else jobs.submit(GLOBAL_KEY, universe=shared["symbols"])
+            return global_view(shared, symbol), job
+    artifact = registry.load(symbol)
+    if artifact is None:
+        return None, jobs.submit(symbol)
+    fresh = registry.is_fresh(artifact, latest=latest_bar([symbol]))
+    return artifact, None if fresh else jobs.submit(symbol)
+
+
+if GLOBAL_MODEL:
+    # Load the shared weights once at startup, or start building them
+    _shared = registry.load(GLOBAL_KEY)
+    if _shared is not None:
+        load_model(GLOBAL_KEY, _shared)
+        print(f"[global] Loaded model for {_shared['n_symbols']} symbols (data as of {_shared['watermark']})")
+    else:
+        jobs.submit(GLOBAL_KEY, universe=GLOBAL_UNIVERSE)
+
+
+# ── ROUTES ────────────────────────────────────────────────────────
+def body_symbols(body):
+    """Upper-cased, de-duplicated tickers from a {"symbols": [...]} body, or
+    None unless symbols is a list of non-empty strings."""
+    symbols = body.get("symbols") if isinstance(body, dict) else None
+    if not isinstance(symbols, list) or not all(isinstance(s, str) and s.strip() for s in symbols):
+        return None
+    return list(dict.fromkeys(s.strip().upper() for s in symbols))
+
 @app.route("/api/predict/<symbol>")
 def predict(symbol):
+    """Serve the latest finished model. A stale model is still served while a
+    retrain runs in the background; with no model at all the caller gets a
+    job id to poll."""
+    symbol = symbol.upper()
     try:
-        result = train_model(symbol.upper())
+        artifact, job = resolve_artifact(symbol)
+        if artifact is None:
+            return jsonify({"symbol": symbol, "status": "training", "jobId": job["id"]}), 202
+        result = forecast(artifact, *live_window(artifact))
+        if job:
+            result["refreshJobId"] = job["id"]
         return jsonify(result)
     except Exception as e:
         print(f"Prediction error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/predict/batch", methods=["POST"])
+def predict_batch():
+    """Forecast a whole watchlist in one round trip.
+
+    Body: {"symbols": [...]}. Symbols with a model are scored together;
+    symbols without one get a training job id under "training".
+    """
+    symbols = body_symbols(request.get_json(silent=True))
+    if symbols is None:
+        return jsonify({"error": "symbols must be a list of ticker strings"}), 400
+    if not symbols:
+        return jsonify({"error": "symbols is required"}), 400
+    if len(symbols) > MAX_BATCH:
+        return jsonify({"error": f"At most {MAX_BATCH} symbols per batch"}), 400
+
+    def prepare(symbol):
+        try:
+            artifact, job = resolve_artifact(symbol)
+        except Exception as e:
+            return symbol, None, None, str(e)
+        if artifact is None:
+            return symbol, None, job, None
+        return symbol, (artifact, *live_window(artifact)), job, None
+
+    results, training, errors = {}, {}, {}
+    ready, refreshing = [], {}
+    for symbol, item, job, error in predict_pool.map(prepare, symbols):
+        if error:
+            errors[symbol] = error
+            continue
+        if item is None:
+            training[symbol] = job["id"]
+            continue
+        ready.append(item)
+        if job:
+            refreshing[symbol] = job["id"]
+
+    try:
+        for result in forecast_batch(ready):
+            if result["symbol"] in refreshing:
+                result["refreshJobId"] = refreshing[result["symbol"]]
+            results[result["symbol"]] = result
+    except Exception as e:
+        print(f"Batch prediction error: {e}")
+        errors.update({item[0]["symbol"]: str(e) for item in ready})
+
+    return jsonify({
+        "results":  [results[s] for s in symbols if s in results],
+        "training": training,
+        "errors":   errors,
+    })
+
+@app.route("/api/train/global", methods=["POST"])
+def train_global():
+    """Queue a global-model run on GLOBAL_UNIVERSE plus any {"symbols": [...]}
+    from the body, e.g. a user watchlist."""
+    body  = request.get_json(silent=True) or {}
+    extra = body_symbols(body) if not isinstance(body, dict) or "symbols" in body else []
+    if extra is None:
+        return jsonify({"error": "symbols must be a list of ticker strings"}), 400
+    job = jobs.submit(GLOBAL_KEY, universe=GLOBAL_UNIVERSE + extra)
+    return jsonify(job), 202
+
+@app.route("/api/train/<symbol>", methods=["POST"])
+def train(symbol):
+    job = jobs.submit(symbol.upper())
+    return jsonify(job), 202
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job)
+
 @app.route("/api/health")
 def health():
-    return jsonify({"status": "ok", "device": str(DEVICE)})
+    return jsonify({"status": "ok", "device": str(DEVICE), "globalModel": GLOBAL_MODEL,
+                    "models": len(registry.symbols()), "jobs": jobs.stats()})
 
 if __name__ == "__main__":
     print("🧠 QuantDesk ML Server — Transformer Model")
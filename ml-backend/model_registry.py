@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+REGISTRY_VERSION = 3
+
+
+def config_key(config):
+    """Short stable hash of the hyperparameters that shape a trained model."""
+    blob = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+
+# ── MODEL REGISTRY ────────────────────────────────────────────────
+class ModelRegistry:
+    """Versioned on-disk store of trained StockTransformer artifacts.
+
+    Layout: <root>/<config-key>/<SYMBOL>.pt, where the config key hashes
+    SEQ_LEN, PRED_DAYS, model size and the feature set. Changing any of them
+    starts a fresh namespace instead of loading weights of the wrong shape.
+    Each artifact holds the state_dict, the fitted feature/target scalers,
+    the last SEQ_LEN raw feature rows, the streaming indicator state at the
+    end of training and the date of the newest bar it saw (the data
+    watermark).
+    """
+
+    def __init__(self, root, config, max_stale_bdays=1):
+        self.config          = dict(config)
+        self.key             = config_key(self.config)
+        self.dir             = Path(root) / self.key
+        self.max_stale_bdays = max_stale_bdays
+        self._lock           = threading.Lock()
+        self._loaded         = {}   # symbol -> (mtime, artifact)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta = self.dir / "config.json"
+        if not meta.exists():
+            meta.write_text(json.dumps(self.config, indent=2, sort_keys=True))
+
+    def path_for(self, symbol):
+        return self.dir / f"{symbol.upper()}.pt"
+
+    def save(self, symbol, artifact):
+        artifact = dict(artifact,
+                        version=REGISTRY_VERSION,
+                        config_key=self.key,
+                        saved_at=time.time())
+        path = self.path_for(symbol)
+        tmp  = path.with_suffix(f".tmp{os.getpid()}")
+        torch.save(artifact, tmp)
+        os.replace(tmp, path)   # atomic — readers never see a half-written file
+        with self._lock:
+            self._loaded[symbol.upper()] = (path.stat().st_mtime, artifact)
+        return path
+
+    def load(self, symbol):
+        """Return the latest artifact for symbol, or None if there is none."""
+        symbol = symbol.upper()
+        path   = self.path_for(symbol)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._loaded.get(symbol)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            artifact = torch.load(path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            print(f"[registry] Could not read {path.name}: {e}")
+            return None
+        if artifact.get("version") != REGISTRY_VERSION or artifact.get("config_key") != self.key:
+            return None
+        with self._lock:
+            self._loaded[symbol] = (mtime, artifact)
+        return artifact
+
+    def is_fresh(self, artifact, latest=None, today=None):
+        """True while no more than max_stale_bdays business days have passed
+        since the newest bar the model was trained on — or, when latest (the
+        date of the newest bar available) is given, while nothing newer than
+        that bar exists. Holidays and halted or delisted symbols then do not
+        count as stale, since a retrain would see the same data."""
+        watermark = np.datetime64(artifact["watermark"], "D")
+        if latest is not None and np.datetime64(latest, "D") <= watermark:
+            return True
+        today     = np.datetime64(today or pd.Timestamp.now().date(), "D")
+        return np.busday_count(watermark, today) <= self.max_stale_bdays
+
+    def symbols(self):
+        return sorted(p.stem for p in self.dir.glob("*.pt"))
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FEATURE_COLUMNS, WARMUP, IndicatorState, build_feature_panel, feature_tensor, make_sequences
+
+
+def reference_features(close, volume):
+    """The pandas build_features the vectorised engine replaced."""
+    delta = close.diff()
+    gain  = delta.clip(lower=0).rolling(14).mean()
+    loss  = (-delta.clip(upper=0)).rolling(14).mean()
+    macd  = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    sma   = close.rolling(20).mean()
+    std   = close.rolling(20).std()
+
+    feat = pd.DataFrame(index=close.index)
+    feat["close"]     = close
+    feat["volume"]    = volume
+    feat["rsi"]       = 100 - (100 / (1 + gain / (loss + 1e-9)))
+    feat["macd"]      = macd
+    feat["macd_sig"]  = macd.ewm(span=9).mean()
+    feat["bb_upper"]  = sma + 2 * std
+    feat["bb_lower"]  = sma - 2 * std
+    feat["bb_width"]  = feat["bb_upper"] - feat["bb_lower"]
+    feat["return_1"]  = close.pct_change(1)
+    feat["return_5"]  = close.pct_change(5)
+    feat["return_10"] = close.pct_change(10)
+    feat["sma_20"]    = sma
+    feat["sma_50"]    = close.rolling(50).mean()
+    feat["ema_12"]    = close.ewm(span=12).mean()
+    return feat.dropna()
+
+
+@pytest.fixture
+def panel():
+    rng   = np.random.default_rng(7)
+    dates = pd.bdate_range("2023-01-02", periods=400)
+    syms  = ["AAA", "BBB", "CCC"]
+    close = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (400, 3)), axis=0)), index=dates, columns=syms)
+    volume = pd.DataFrame(rng.uniform(1e6, 5e6, (400, 3)), index=dates, columns=syms)
+    return close, volume
+
+
+def test_panel_matches_pandas(panel):
+    close, volume = panel
+    values, dates, symbols = build_feature_panel(close, volume, dtype=np.float64)
+    assert symbols == list(close.columns)
+    for i, s in enumerate(symbols):
+        ref = reference_features(close[s], volume[s])
+        assert list(dates) == list(ref.index)
+        np.testing.assert_allclose(values[i], ref[FEATURE_COLUMNS].to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+def test_streaming_rows_match_batch(panel):
+    close, volume = panel
+    c, v  = close["AAA"].to_numpy(), volume["AAA"].to_numpy()
+    batch = feature_tensor(c[None], v[None])[0]
+
+    state = IndicatorState.from_history(c[:WARMUP + 10])
+    rows  = np.array([state.update(c[t], v[t]) for t in range(WARMUP + 10, len(c))])
+    np.testing.assert_allclose(rows, batch[WARMUP + 10:], rtol=1e-9, atol=1e-9)
+
+
+def test_state_round_trip(panel):
+    close, volume = panel
+    c, v  = close["BBB"].to_numpy(), volume["BBB"].to_numpy()
+    state = IndicatorState.from_history(c[:200])
+    copy  = IndicatorState.from_dict(state.to_dict())
+
+    for t in range(200, len(c)):
+        np.testing.assert_allclose(copy.update(c[t], v[t]), state.update(c[t], v[t]), rtol=1e-9, atol=1e-9)
+
+
+def test_sequences_are_views(panel):
+    close, volume = panel
+    values, _, _ = build_feature_panel(close, volume)
+    feat, target = values[0], values[0][:, :1]
+    X, y = make_sequences(feat, target, 60, 5)
+
+    n = len(feat) - 60 - 5 + 1
+    assert X.shape == (n, 60, len(FEATURE_COLUMNS)) and y.shape == (n, 5)
+    assert np.shares_memory(X, feat) and not X.flags.writeable
+    for i in (0, n // 2, n - 1):
+        np.testing.assert_array_equal(X[i], feat[i:i + 60])
+        np.testing.assert_array_equal(y[i], target[i + 60:i + 65, 0])
+
+    X, y = make_sequences(feat[:64], target[:64], 60, 5)
+    assert X.shape == (0, 60, len(FEATURE_COLUMNS)) and y.shape == (0, 5)